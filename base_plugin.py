@@ -43,6 +43,9 @@ class BasePlugin(object):
     connected clients. self.protocol will be changed by the plugin manager to
     the current protocol.
 
+    The plugin's section of the configuration is bound to
+    self.plugin_config when the plugin is imported.
+
     You may access the factory if necessary via self.factory.protocols
     to access other clients, but this 'Is Not A Very Good Idea' (tm)
 
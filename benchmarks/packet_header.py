@@ -0,0 +1,63 @@
+"""
+Compares the construct based packet header path with packets.header.
+
+Run from the repository root:
+
+    python benchmarks/packet_header.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+from construct import Container
+
+import packets
+from packets.header import read_header, write_header
+
+
+NUMBER = 100000
+SIZES = [1, 200, 70000]
+
+
+def construct_read(raw):
+    header = packets.start_packet().parse(raw)
+    header_length = 1 + len(packets.SignedVLQ('').build(header.payload_size))
+    return header.id, abs(header.payload_size), header_length
+
+
+def construct_write(size):
+    return packets.start_packet().build(Container(id=17, payload_size=size))
+
+
+def report(label, construct_time, codec_time):
+    print '{:<28} construct {:>8.2f} us   codec {:>6.2f} us   x{:.1f}'.format(
+        label,
+        construct_time / NUMBER * 1e6,
+        codec_time / NUMBER * 1e6,
+        construct_time / codec_time
+    )
+
+
+def main():
+    for size in SIZES:
+        raw = write_header(17, size) + 'x' * size
+        buf = bytearray(raw)
+        report(
+            'read header ({} bytes)'.format(size),
+            timeit.timeit(lambda: construct_read(raw), number=NUMBER),
+            timeit.timeit(lambda: read_header(buf), number=NUMBER)
+        )
+    for size in SIZES:
+        report(
+            'write header ({} bytes)'.format(size),
+            timeit.timeit(lambda: construct_write(size), number=NUMBER),
+            timeit.timeit(lambda: write_header(17, size), number=NUMBER)
+        )
+
+
+if __name__ == '__main__':
+    main()
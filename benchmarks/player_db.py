@@ -0,0 +1,108 @@
+"""
+Compares player database throughput with and without the storage profile.
+
+The baseline opens the database the way SQLite and SQLAlchemy do by
+default: rollback journal, synchronous=FULL and a new connection per
+session. Run from the repository root:
+
+    python benchmarks/player_db.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+from twisted.python.filepath import FilePath
+
+from plugins.core.player_manager_plugin import manager
+
+
+PLAYERS = 200
+PROFILES = [
+    ('default', {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'mmap_size': 0,
+        'cache_size': -2000,
+        'cached_statements': 100,
+        'pool': 'null'
+    }),
+    ('tuned', {}),
+]
+
+
+class Config(object):
+    player_db = 'player.db'
+    owner_uuid = 'owner'
+
+    def __init__(self, profile):
+        self.player_db_profile = profile
+
+
+def timed(f):
+    start = time.time()
+    f()
+    return time.time() - start
+
+
+def login(player_manager):
+    for i in xrange(PLAYERS):
+        player = player_manager.fetch_or_create(
+            uuid='uuid{}'.format(i),
+            name='Player{}'.format(i),
+            org_name='Player{}'.format(i),
+            admin_logged_in=False,
+            ip='127.0.0.1',
+            protocol=str(i)
+        )
+        player.logged_in = False
+        player_manager.end_session(player)
+
+
+def lookup(player_manager):
+    for i in xrange(PLAYERS):
+        player_manager.get_by_name('player{}'.format(i))
+        player_manager.get_by_org_name('PLAYER{}'.format(i))
+
+
+def update(player_manager):
+    for i in xrange(PLAYERS):
+        player = player_manager.get_by_uuid('uuid{}'.format(i))
+        player.planet = 'planet {}'.format(i)
+        player_manager.flush()
+
+
+def run(profile):
+    tempdir = tempfile.mkdtemp()
+    manager.path = FilePath(tempdir)
+    try:
+        player_manager = manager.PlayerManager(Config(profile))
+        return [
+            (name, timed(lambda: f(player_manager)))
+            for name, f in [
+                ('login', login), ('lookup', lookup), ('update', update)
+            ]
+        ]
+    finally:
+        shutil.rmtree(tempdir)
+
+
+def main():
+    results = [(label, run(profile)) for label, profile in PROFILES]
+    for i, (name, _) in enumerate(results[0][1]):
+        print '{:<8} {}'.format(
+            name,
+            '   '.join(
+                '{} {:>8.0f}/s'.format(label, PLAYERS / timings[i][1])
+                for label, timings in results
+            )
+        )
+
+
+if __name__ == '__main__':
+    main()
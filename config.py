@@ -1,9 +1,14 @@
+from collections import MutableMapping
+import copy
 import io
 import json
 import logging
 import inspect
 import sys
 import os
+import threading
+
+from twisted.internet import reactor, threads
 
 from utility_functions import (
     recursive_dictionary_update,
@@ -12,6 +17,44 @@ from utility_functions import (
 )
 
 
+class PluginConfig(MutableMapping):
+    """
+    One plugin's section of the configuration, as a dict.
+
+    The section is looked up by name on each access, so the view stays
+    valid when the configuration is replaced. Plugins get theirs bound to
+    `self.plugin_config` when they are imported.
+    """
+
+    def __init__(self, config_manager, name):
+        self.config_manager = config_manager
+        self.name = name
+
+    def _section(self, create=False):
+        sections = self.config_manager.config['plugin_config']
+        if create:
+            return sections.setdefault(self.name, {})
+        return sections.get(self.name, {})
+
+    def __getitem__(self, key):
+        return self._section()[key]
+
+    def __setitem__(self, key, value):
+        self._section(create=True)[key] = value
+
+    def __delitem__(self, key):
+        del self._section()[key]
+
+    def __iter__(self):
+        return iter(self._section())
+
+    def __len__(self):
+        return len(self._section())
+
+    def __repr__(self):
+        return 'PluginConfig({!r}, {!r})'.format(self.name, self._section())
+
+
 class ConfigurationManager(object):
     __metaclass__ = Singleton
 
@@ -24,6 +67,16 @@ class ConfigurationManager(object):
     logger.addHandler(logfile_handle)
     logfile_handle.setFormatter(log_format)
 
+    # Saves are scheduled on `clock` and written by a worker thread. Each
+    # save gets a version, and the lock keeps an older version from being
+    # written over a newer one.
+    clock = reactor
+    _save_call = None
+    _save_pending = False
+    _save_version = 0
+    _saved_version = 0
+    _save_lock = threading.Lock()
+
     def __init__(self):
         default_config_path = path.preauthChild(
             os.path.join('config', 'config.json.default')
@@ -96,24 +149,105 @@ class ConfigurationManager(object):
         self.save()
 
     def save(self):
+        """
+        Schedules the configuration file to be written.
+
+        Changes made within `config_save_delay` seconds of each other are
+        written together, on a worker thread.
+        """
+        self.__dict__['_save_pending'] = True
+        if self._save_call is None or not self._save_call.active():
+            self.__dict__['_save_call'] = self.clock.callLater(
+                self.config_save_delay, self._save_in_thread
+            )
+
+    def _take_snapshot(self):
+        self.__dict__['_save_pending'] = False
+        self.__dict__['_save_version'] = self._save_version + 1
+        return self._save_version, copy.deepcopy(self.config)
+
+    def _save_in_thread(self):
+        version, config = self._take_snapshot()
+        d = threads.deferToThread(self._write, version, config)
+        d.addErrback(
+            lambda failure: self.logger.critical(
+                'Tried to save the configuration file, failed.\n%s',
+                failure.getErrorMessage()
+            )
+        )
+        return d
+
+    def flush(self):
+        """
+        Writes any scheduled changes right away, on the calling thread.
+        """
+        if self._save_call is not None and self._save_call.active():
+            self._save_call.cancel()
+        if not self._save_pending:
+            return
         try:
-            with io.open(self.config_path.path, 'w') as config:
-                self.logger.debug('Writing configuration file.')
-                config.write(
-                    json.dumps(
-                        self.config,
-                        indent=4,
-                        separators=(',', ': '),
-                        sort_keys=True,
-                        ensure_ascii=False
-                    )
-                )
+            self._write(*self._take_snapshot())
         except Exception as e:
             self.logger.critical(
                 'Tried to save the configuration file, failed.\n%s', str(e)
             )
             raise
 
+    def _write(self, version, config):
+        """
+        Writes a configuration to a temporary file, then renames it over
+        config.json, so the file is never left half written.
+        """
+        data = json.dumps(
+            config,
+            indent=4,
+            separators=(',', ': '),
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        if isinstance(data, str):
+            data = data.decode('utf-8')
+        with self._save_lock:
+            if version <= self._saved_version:
+                return
+            target = self.config_path.path
+            temp = target + '.tmp'
+            with io.open(temp, 'w', encoding='utf-8') as f:
+                self.logger.debug('Writing configuration file.')
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.name == 'nt' and os.path.exists(target):
+                # Windows won't rename over an existing file.
+                os.remove(target)
+            os.rename(temp, target)
+            self.__dict__['_saved_version'] = version
+
+    def plugin_config_for(self, name):
+        """
+        Returns the PluginConfig of the named plugin.
+        """
+        return PluginConfig(self, name)
+
+    def _snapshot(self):
+        """
+        Copies the top level options to instance attributes, so reading
+        them is a plain attribute lookup.
+
+        `plugin_config` is left out, as it depends on the caller.
+        """
+        for key in self.__dict__.pop('_snapshot_keys', []):
+            self.__dict__.pop(key, None)
+        keys = [
+            key for key in self.config
+            if key != 'plugin_config' and
+            key not in self.__dict__ and
+            not hasattr(type(self), key)
+        ]
+        for key in keys:
+            self.__dict__[key] = self.config[key]
+        self.__dict__['_snapshot_keys'] = keys
+
     def __getattr__(self, item):
         if item in ['config', 'config_path']:
             return super(ConfigurationManager, self).__getattribute__(item)
@@ -138,6 +272,7 @@ class ConfigurationManager(object):
     def __setattr__(self, key, value):
         if key == 'config':
             super(ConfigurationManager, self).__setattr__(key, value)
+            self._snapshot()
             self.save()
         elif key == 'config_path':
             super(ConfigurationManager, self).__setattr__(key, value)
@@ -147,4 +282,8 @@ class ConfigurationManager(object):
             self.save()
         else:
             self.config[key] = value
+            if key in self._snapshot_keys:
+                self.__dict__[key] = value
+            else:
+                self._snapshot()
             self.save()
@@ -0,0 +1,126 @@
+"""
+Caps the memory the proxy holds in framing buffers and pending writes.
+"""
+import logging
+
+
+class ConnectionUsage(object):
+    """
+    Current and peak memory held for one proxied connection, in bytes.
+    """
+
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+        self.over_since = None
+
+    def update(self, usage):
+        self.current = usage
+        if usage > self.peak:
+            self.peak = usage
+        return usage
+
+
+class MemoryBudget(object):
+    """
+    Enforces a per-connection and a global limit on proxy memory.
+
+    A connection over budget first has reading paused on both of its sides,
+    so no more data piles up for it. If it is still over budget once
+    `grace_period` seconds have passed it gets disconnected. When the
+    global limit is exceeded, the heaviest connections are treated as over
+    budget until the rest fit.
+
+    Protocols checked must provide `memory` (a ConnectionUsage),
+    `memory_usage()`, `pause_reading(reason)`, `resume_reading(reason)` and
+    `die()`.
+
+    A connection has to be able to hold a whole inflated packet, or one
+    that large would be paused mid-frame and never finish, so
+    `connection_limit` must be over `max_packet_size`.
+    """
+    logger = logging.getLogger('starrypy.memory_budget.MemoryBudget')
+
+    def __init__(
+        self,
+        connection_limit,
+        global_limit,
+        grace_period,
+        max_packet_size=0
+    ):
+        if connection_limit <= max_packet_size:
+            raise ValueError(
+                'connection_memory_limit ({}) must be larger than '
+                'max_decompressed_size ({}).'.format(
+                    connection_limit, max_packet_size
+                )
+            )
+        self.connection_limit = connection_limit
+        self.global_limit = global_limit
+        self.grace_period = grace_period
+        self.current = 0
+        self.peak = 0
+
+    def check(self, protocols, now):
+        """
+        Measures every protocol, then throttles, resumes or disconnects them
+        as needed.
+
+        :param protocols: The protocols to check.
+        :param now: The current time, in seconds.
+        :return: None
+        """
+        usages = [
+            (protocol, protocol.memory.update(protocol.memory_usage()))
+            for protocol in protocols
+        ]
+        total = sum(usage for _, usage in usages)
+        self.current = total
+        if total > self.peak:
+            self.peak = total
+
+        over = {}
+        for protocol, usage in usages:
+            if usage > self.connection_limit:
+                over[protocol] = (
+                    'it holds {} bytes, over the {} bytes allowed per '
+                    'connection'.format(usage, self.connection_limit)
+                )
+        if total > self.global_limit:
+            for protocol, usage in sorted(
+                    usages, key=lambda x: x[1], reverse=True
+            ):
+                if total <= self.global_limit:
+                    break
+                over.setdefault(
+                    protocol,
+                    'the proxy holds {} bytes, over the {} bytes allowed in '
+                    'total, and it is one of the heaviest '
+                    'connections'.format(self.current, self.global_limit)
+                )
+                total -= usage
+
+        for protocol, _ in usages:
+            memory = protocol.memory
+            if protocol in over:
+                if memory.over_since is None:
+                    memory.over_since = now
+                    protocol.pause_reading(self)
+                    self.logger.warning(
+                        'Throttling protocol %s: %s.',
+                        protocol.id, over[protocol]
+                    )
+                elif now - memory.over_since >= self.grace_period:
+                    self.logger.warning(
+                        'Disconnecting protocol %s: %s for more than %s '
+                        'seconds.',
+                        protocol.id, over[protocol], self.grace_period
+                    )
+                    protocol.die()
+            elif memory.over_since is not None:
+                memory.over_since = None
+                protocol.resume_reading(self)
+                self.logger.info(
+                    'Protocol %s is back within its memory budget.',
+                    protocol.id
+                )
@@ -0,0 +1,137 @@
+"""
+Coalesces the writes going out over one proxied connection, and throttles
+reading from the other side when they back up.
+"""
+import logging
+
+from twisted.internet import reactor
+from twisted.internet.interfaces import IPushProducer
+from zope.interface import implementer
+
+
+class ReadThrottle(object):
+    """
+    Pauses reading from a transport while anything asks it to.
+
+    Several parties may want a connection paused at the same time, for
+    instance backpressure and a memory budget. Each pauses and resumes
+    under its own reason, and the transport only resumes once none is left.
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.reasons = set()
+
+    @property
+    def paused(self):
+        return bool(self.reasons)
+
+    def pause(self, reason):
+        if not self.reasons:
+            self.transport.pauseProducing()
+        self.reasons.add(reason)
+
+    def resume(self, reason):
+        if reason not in self.reasons:
+            return
+        self.reasons.discard(reason)
+        if not self.reasons:
+            self.transport.resumeProducing()
+
+
+@implementer(IPushProducer)
+class OutputQueue(object):
+    """
+    Gathers everything written to a transport during a reactor turn and
+    hands it over in a single `writeSequence` call.
+
+    The queue registers itself as a streaming producer on the transport it
+    writes to. When that transport's buffer fills up, Twisted pauses the
+    queue, which in turn pauses `source`, the ReadThrottle of the transport
+    on the other side of the proxy, until the slow side has caught up.
+    `close` has to be called before the connection is closed.
+    """
+    logger = logging.getLogger('starrypy.output_queue.OutputQueue')
+
+    def __init__(self, transport, source=None):
+        self.transport = transport
+        self.source = source
+        self.pending = []
+        self.pending_bytes = 0
+        self.paused = False
+        self.flush_call = None
+        self.closed = False
+        transport.registerProducer(self, True)
+
+    def write(self, data):
+        """
+        Queues data to be written at the end of the current reactor turn.
+
+        :param data: Data to send.
+        :return: None
+        """
+        self.pending.append(data)
+        self.pending_bytes += len(data)
+        if self.flush_call is None:
+            self.flush_call = reactor.callLater(0, self.flush)
+
+    @property
+    def buffered_bytes(self):
+        """
+        Bytes written to this queue which haven't gone out yet, including
+        what is still sitting in the transport's own buffer.
+        """
+        transport = self.transport
+        # Twisted doesn't expose this, so peek at FileDescriptor's buffers.
+        unsent = (
+            len(getattr(transport, 'dataBuffer', '')) -
+            getattr(transport, 'offset', 0) +
+            getattr(transport, '_tempDataLen', 0)
+        )
+        return self.pending_bytes + unsent
+
+    def flush(self):
+        """
+        Writes out everything queued so far.
+
+        :return: None
+        """
+        if self.flush_call is not None and self.flush_call.active():
+            self.flush_call.cancel()
+        self.flush_call = None
+        if self.pending:
+            pending = self.pending
+            self.pending = []
+            self.pending_bytes = 0
+            self.transport.writeSequence(pending)
+
+    def close(self):
+        """
+        Writes out everything queued so far and stops being the transport's
+        producer. Called before the connection is closed: a paused producer
+        would otherwise keep the transport from finishing the close.
+
+        :return: None
+        """
+        self.flush()
+        if not self.closed:
+            self.closed = True
+            self.transport.unregisterProducer()
+
+    def pauseProducing(self):
+        self.paused = True
+        if self.source is not None:
+            self.logger.debug('Output is backing up; pausing its source.')
+            self.source.pause(self)
+
+    def resumeProducing(self):
+        self.paused = False
+        if self.source is not None:
+            self.source.resume(self)
+
+    def stopProducing(self):
+        if self.flush_call is not None and self.flush_call.active():
+            self.flush_call.cancel()
+        self.flush_call = None
+        self.pending = []
+        self.pending_bytes = 0
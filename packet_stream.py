@@ -1,11 +1,102 @@
 import logging
 import pprint
 import zlib
-import datetime
-import packets
+
+from construct import Container
+
+from packets import packet_struct
+from packets.header import read_header
+from utility_functions import build_packet
+
+
+class PacketView(Container):
+    """
+    The parsed payload of a Packet, as handed to plugins.
+
+    Assigning or deleting a field marks the owning packet dirty, so plugins
+    can edit a packet in place and leave it to the proxy to rebuild it.
+    Changes made deeper inside nested values are not seen; call
+    `Packet.mark_dirty()` after those.
+    """
+    __slots__ = ['_packet']
+
+    def __init__(self, packet, parsed):
+        Container.__init__(self)
+        object.__setattr__(self, '_packet', packet)
+        for key, value in parsed.iteritems():
+            Container.__setitem__(self, key, value)
+
+    def __setitem__(self, key, value):
+        Container.__setitem__(self, key, value)
+        self._packet.dirty = True
+
+    def __delitem__(self, key):
+        Container.__delitem__(self, key)
+        self._packet.dirty = True
+
+    __setattr__ = __setitem__
+    __delattr__ = __delitem__
+
+    def pop(self, key, *default):
+        if key not in self:
+            return dict.pop(self, key, *default)
+        value = Container.pop(self, key)
+        self._packet.dirty = True
+        return value
+
+    def popitem(self):
+        item = Container.popitem(self)
+        self._packet.dirty = True
+        return item
+
+    def clear(self):
+        Container.clear(self)
+        self._packet.dirty = True
+
+    def update(self, seq=(), **kw):
+        Container.update(self, seq)
+        for key, value in kw.iteritems():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def copy(self):
+        """
+        Returns a plain Container with the same fields, detached from the
+        packet.
+        """
+        copy = Container()
+        Container.update(copy, self.iteritems())
+        return copy
+
+    __update__ = update
+    __copy__ = copy
+
+
+class PacketTooLarge(Exception):
+    """
+    Raised when a compressed payload inflates past the configured maximum.
+    """
 
 
 class Packet(object):
+    """
+    A single framed packet, shared by every plugin hook that sees it.
+
+    `parsed` decodes the payload on first access and is memoized, so plugins
+    hooking the same packet don't each parse it again. Plugins which want to
+    change a packet edit `parsed` in place and let it through; the proxy then
+    forwards `serialize()`, which returns `original_data` untouched unless
+    the packet was changed, and rebuilds it once if it was.
+
+    Compressed packets which no plugin hooks arrive without `data`; it is
+    only inflated if something reads it, and may not grow past
+    `max_decompressed_size` then either.
+    """
+
     def __init__(
         self,
         packet_id,
@@ -13,21 +104,113 @@ class Packet(object):
         data,
         original_data,
         direction,
-        compressed=False
+        compressed=False,
+        max_decompressed_size=None
     ):
         self.id = packet_id
         self.payload_size = payload_size
-        self.data = data
+        self._data = data
         self.original_data = original_data
         self.direction = direction
         self.compressed = compressed
+        self.max_decompressed_size = max_decompressed_size
+        self.dirty = False
+        self._parsed = None
+
+    @property
+    def data(self):
+        """
+        The uncompressed payload.
+
+        :raises PacketTooLarge: If the payload inflates past
+                                `max_decompressed_size`.
+        """
+        if self._data is None:
+            payload = self.original_data[
+                len(self.original_data) + self.payload_size:
+            ]
+            limit = self.max_decompressed_size
+            if limit is None:
+                self._data = zlib.decompressobj().decompress(payload)
+            else:
+                data = zlib.decompressobj().decompress(payload, limit + 1)
+                if len(data) > limit:
+                    raise PacketTooLarge(
+                        'Packet {} inflates past {} bytes.'.format(
+                            self.id, limit
+                        )
+                    )
+                self._data = data
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+
+    @property
+    def parsed(self):
+        """
+        The payload, decoded with the shared parser for this packet id.
+        None if there is no parser for this packet id.
+        """
+        if self._parsed is None:
+            struct = packet_struct(self.id)
+            if struct is None:
+                return None
+            parsed = struct.parse(self.data)
+            if isinstance(parsed, Container):
+                parsed = PacketView(self, parsed)
+            self._parsed = parsed
+        return self._parsed
+
+    def mark_dirty(self):
+        """
+        Flags the parsed payload as modified, so it gets rebuilt before the
+        packet is forwarded. Only needed after changing nested values.
+        """
+        self.dirty = True
+
+    def serialize(self):
+        """
+        :return: The raw packet to forward; original_data unless the parsed
+                 payload was modified.
+        :rtype : str
+        """
+        if self.dirty:
+            self.data = packet_struct(self.id).build(self._parsed)
+            self.payload_size = len(self.data)
+            self.compressed = False
+            self.original_data = build_packet(self.id, self.data)
+            self.dirty = False
+        return self.original_data
 
 
 class PacketStream(object):
+    """
+    Reassembles Starbound packets from the raw TCP stream.
+
+    Incoming data is appended to a growable bytearray and consumed through a
+    read offset, so a frame that arrives in many segments is never copied
+    more than once. The consumed prefix is only discarded once it makes up
+    at least half of the buffer, which keeps compaction amortized O(1) per
+    byte.
+
+    `interest` is the protocol's bitmap of packet ids plugins look at.
+    Compressed frames with a flagged id are inflated incrementally while
+    their bytes arrive, and may not grow past `max_decompressed_size`; the
+    others are never inflated unless something reads their data.
+
+    With `selective` set, the stream works in selective passthrough mode:
+    only frames whose id is flagged are extracted and handed to the
+    protocol. Everything else is only framed, and each run of such frames is
+    handed to `protocol.forward_raw` as one string, starting as soon as its
+    bytes arrive.
+    """
     logger = logging.getLogger('starrypy.packet_stream.PacketStream')
 
     def __init__(self, protocol):
-        self._stream = ''
+        self._buffer = bytearray()
+        self._offset = 0
         self.id = None
         self.payload_size = None
         self.header_length = None
@@ -37,88 +220,258 @@ class PacketStream(object):
         self.packet_size = None
         self.protocol = protocol
         self.direction = None
-        self.last_received_timestamp = datetime.datetime.now()
+        self.interest = None
+        self.selective = False
+        self.max_decompressed_size = 64 * 1024 * 1024
+        self.forward_remaining = 0
+        self.frames_drained = 0
+        self.bytes_pending = 0
+        self.closed = False
+        self._decompressor = None
+        self._decompress_error = None
+        self._fed = 0
+        self._chunks = []
+        self._decompressed_size = 0
 
     def __add__(self, other):
-        self._stream += other
-        try:
-            self.start_packet()
-            self.check_packet()
-        except:
-            pass
-        finally:
-            self.last_received_timestamp = datetime.datetime.now()
+        if self.closed:
+            return self
+        self._buffer.extend(other)
+        self.dispatch(self.drain())
         return self
 
+    @property
+    def memory_usage(self):
+        """
+        Bytes held by the stream: its buffer, including any consumed prefix
+        not compacted yet, and the payload inflated so far.
+        """
+        return len(self._buffer) + self._decompressed_size
+
+    @property
+    def buffered(self):
+        """
+        Number of received bytes which have not been consumed yet.
+        """
+        return len(self._buffer) - self._offset
+
     def start_packet(self):
-        try:
-            if len(self._stream) > 2 and self.payload_size is None:
-                packet_header = packets.start_packet().parse(self._stream)
-                self.id = packet_header.id
-                self.payload_size = abs(packet_header.payload_size)
-                if packet_header.payload_size < 0:
-                    self.compressed = True
-                else:
-                    self.compressed = False
-                self.header_length = 1 + len(packets.SignedVLQ('').build(
-                    packet_header.payload_size)
-                )
-                self.packet_size = self.payload_size + self.header_length
-                return True
-        except RuntimeError:
-            self.logger.error('Unknown error in start_packet.')
+        """
+        Reads the header of the next frame, if it isn't known already.
+
+        :return: Whether the header of the next frame is known.
+        """
+        if self.payload_size is not None:
+            return True
+        header = read_header(self._buffer, self._offset)
+        if header is None:
             return False
+        (
+            self.id,
+            self.payload_size,
+            self.compressed,
+            self.header_length
+        ) = header
+        self.packet_size = self.payload_size + self.header_length
+        if self.compressed and (
+                self.interest is None or self.interest[self.id]
+        ):
+            self._decompressor = zlib.decompressobj()
+        return True
+
+    def drain(self):
+        """
+        Extracts every complete frame currently in the buffer.
 
-    def check_packet(self):
+        Updates `frames_drained` and `bytes_pending` for this call.
+
+        :return: List of Packets, in stream order. In selective passthrough
+                 mode, runs of uninteresting frames are included in between
+                 as raw strings.
+        """
         try:
-            if (
-                    self.packet_size is not None and
-                    len(self._stream) >= self.packet_size
-            ):
-                p = self._stream[:self.packet_size]
-                self._stream = self._stream[self.packet_size:]
-                if not self._stream:
-                    self._stream = ''
-                p_parsed = packets.packet().parse(p)
-                if self.compressed:
-                    try:
-                        z = zlib.decompressobj()
-                        p_parsed.data = z.decompress(p_parsed.data)
-                    except zlib.error:
-                        self.logger.error(
-                            'Decompression error in check_packet.'
-                        )
-                        self.logger.debug('Parsed packet:')
-                        self.logger.debug(pprint.pformat(p_parsed))
-                        self.logger.debug('Packet data:')
-                        self.logger.debug(
-                            pprint.pformat(
-                                p_parsed.original_data.encode('hex')
-                            )
-                        )
-                        self.logger.debug('Following packet data:')
-                        self.logger.debug(
-                            pprint.pformat(self._stream.encode('hex'))
-                        )
-                        raise
-                packet = Packet(
-                    packet_id=p_parsed.id,
-                    payload_size=p_parsed.payload_size,
-                    data=p_parsed.data,
-                    original_data=p,
-                    direction=self.direction
+            if self.selective:
+                return self._drain_selective()
+            return self._drain()
+        except PacketTooLarge as e:
+            self.close(str(e))
+            return []
+
+    def close(self, reason):
+        """
+        Stops reading the stream and drops the connection it belongs to.
+        """
+        self.logger.error('%s Closing the connection.', reason)
+        self.closed = True
+        del self._buffer[:]
+        self._offset = 0
+        self.reset()
+        self.protocol.close_output()
+        self.protocol.transport.loseConnection()
+
+    def _drain(self):
+        packets = []
+        while self.start_packet():
+            if self.buffered < self.packet_size:
+                self._feed()
+                break
+            try:
+                packets.append(self._extract_packet())
+            except zlib.error:
+                self.logger.error(
+                    'Decompression error in packet %s, dropping it.', self.id
                 )
+            finally:
+                self.reset()
+        self.frames_drained = len(packets)
+        self.bytes_pending = self.buffered
+        return packets
 
-                self.compressed = False
+    def dispatch(self, packets):
+        """
+        Hands drained packets to the protocol, one at a time.
+        """
+        for packet in packets:
+            if type(packet) is str:
+                try:
+                    self.protocol.forward_raw(packet)
+                except:
+                    self.logger.exception('Error while forwarding frames.')
+                continue
+            try:
                 self.protocol.string_received(packet)
+            except:
+                self.logger.exception(
+                    'Error while handling packet %s.', packet.id
+                )
+
+    def _drain_selective(self):
+        items = []
+        frames = 0
+        interest = self.interest
+        # Uninteresting bytes are skipped by moving the offset only, so
+        # nothing gets compacted until the current run has been copied out.
+        run_start = self._offset
+        while True:
+            if self.forward_remaining:
+                size = min(self.forward_remaining, self.buffered)
+                self._offset += size
+                self.forward_remaining -= size
+                if self.forward_remaining:
+                    break
+                frames += 1
+            if not self.start_packet():
+                break
+            if not interest[self.id]:
+                self.forward_remaining = self.packet_size
                 self.reset()
-                if self.start_packet():
-                    self.check_packet()
-        except RuntimeError:
-            self.logger.error('Unknown error in check_packet')
+                continue
+            if self.buffered < self.packet_size:
+                self._feed()
+                break
+            if self._offset > run_start:
+                items.append(self._copy_run(run_start))
+            try:
+                items.append(self._extract_packet())
+                frames += 1
+            except zlib.error:
+                self.logger.error(
+                    'Decompression error in packet %s, dropping it.', self.id
+                )
+            finally:
+                self.reset()
+            run_start = self._offset
+        if self._offset > run_start:
+            items.append(self._copy_run(run_start))
+            self._consume(0)
+        self.frames_drained = frames
+        self.bytes_pending = self.buffered
+        return items
+
+    def _copy_run(self, start):
+        return str(buffer(self._buffer, start, self._offset - start))
+
+    def _feed(self):
+        """
+        Inflates whatever part of the current compressed payload has been
+        received and not inflated yet.
+        """
+        if self._decompressor is None:
+            return
+        start = self._offset + self.header_length + self._fed
+        size = min(self.buffered, self.packet_size) - (
+            self.header_length + self._fed
+        )
+        if size <= 0:
+            return
+        self._fed += size
+        room = self.max_decompressed_size - self._decompressed_size
+        try:
+            chunk = self._decompressor.decompress(
+                buffer(self._buffer, start, size), room + 1
+            )
+        except zlib.error as e:
+            # Remembered until the frame is complete, so it can be skipped.
+            self._decompressor = None
+            self._decompress_error = e
+            return
+        if len(chunk) > room:
+            raise PacketTooLarge(
+                'Packet {} inflates past {} bytes.'.format(
+                    self.id, self.max_decompressed_size
+                )
+            )
+        self._decompressed_size += len(chunk)
+        self._chunks.append(chunk)
+
+    def _extract_packet(self):
+        p = str(buffer(self._buffer, self._offset, self.packet_size))
+        try:
+            data = p[self.header_length:]
+            self._feed()
+            if self._decompress_error is not None:
+                self.logger.debug('Packet data:')
+                self.logger.debug(pprint.pformat(p.encode('hex')))
+                raise self._decompress_error
+            elif self._decompressor is not None:
+                self._chunks.append(self._decompressor.flush())
+                data = ''.join(self._chunks)
+            elif self.compressed:
+                data = None
+        finally:
+            self._consume(self.packet_size)
+        return Packet(
+            packet_id=self.id,
+            payload_size=(
+                -self.payload_size if self.compressed else self.payload_size
+            ),
+            data=data,
+            original_data=p,
+            direction=self.direction,
+            compressed=self.compressed,
+            max_decompressed_size=self.max_decompressed_size
+        )
+
+    def _consume(self, size):
+        """
+        Advances the read offset, compacting the buffer once the consumed
+        prefix outweighs the unread remainder.
+        """
+        self._offset += size
+        if self._offset == len(self._buffer):
+            del self._buffer[:]
+            self._offset = 0
+        elif self._offset << 1 >= len(self._buffer):
+            del self._buffer[:self._offset]
+            self._offset = 0
 
     def reset(self):
         self.id = None
         self.payload_size = None
         self.packet_size = None
         self.compressed = False
+        self._decompressor = None
+        self._decompress_error = None
+        self._fed = 0
+        self._chunks = []
+        self._decompressed_size = 0
@@ -1,3 +1,4 @@
+from functools import wraps
 import logging
 
 from construct import (
@@ -13,6 +14,27 @@ from construct import (
 )
 from construct.core import _read_stream, _write_stream, Adapter
 
+from header import write_vlq, write_signed_vlq
+
+
+def cached_struct(factory):
+    """
+    Memoizes a struct factory. Constructs don't keep any parsing state, so a
+    single instance per set of arguments can be shared by every caller.
+    """
+    cache = {}
+
+    @wraps(factory)
+    def accessor(*args, **kwargs):
+        key = args + tuple(sorted(kwargs.iteritems()))
+        try:
+            return cache[key]
+        except KeyError:
+            struct = cache[key] = factory(*args, **kwargs)
+            return struct
+
+    return accessor
+
 
 class SignedVLQ(Construct):
     logger = logging.getLogger('starrypy.packets.SignedVLQ')
@@ -31,10 +53,8 @@ class SignedVLQ(Construct):
 
     def _build(self, obj, stream, context):
         try:
-            value = abs(obj * 2)
-            if obj < 0:
-                value -= 1
-            VLQ('')._build(value, stream, context)
+            data = write_signed_vlq(int(obj))
+            _write_stream(stream, len(data), data)
         except:
             self.logger.exception('Error building SignedVLQ.')
             raise
@@ -53,23 +73,11 @@ class VLQ(Construct):
         return value
 
     def _build(self, obj, stream, context):
-        result = bytearray()
-        value = int(obj)
-        if obj == 0:
-            _write_stream(stream, 1, chr(0))
-            return
-        while value > 0:
-            byte = value & 0x7f
-            value >>= 7
-            if value != 0:
-                byte |= 0x80
-            result.insert(0, byte)
-        if len(result) > 1:
-            result[0] |= 0x80
-            result[-1] ^= 0x80
-        _write_stream(stream, len(result), ''.join(map(chr, result)))
+        data = write_vlq(int(obj))
+        _write_stream(stream, len(data), data)
 
 
+@cached_struct
 def star_string(name='star_string'):
         return StarStringAdapter(star_string_struct(name))
 
@@ -90,6 +98,7 @@ class Joiner(Adapter):
         return ''.join(obj)
 
 
+@cached_struct
 def star_string_struct(name='star_string'):
     return Struct(
         name,
@@ -100,30 +109,30 @@ def star_string_struct(name='star_string'):
 
 class VariantVariant(Construct):
     def _parse(self, stream, context):
-        l = VLQ('').parse_stream(stream)
-        return [Variant('').parse_stream(stream) for _ in range(l)]
+        l = _vlq.parse_stream(stream)
+        return [_variant.parse_stream(stream) for _ in range(l)]
 
 
 class ChunkVariant(Construct):
     def _parse(self, stream, context):
-        l = VLQ('').parse_stream(stream)
+        l = _vlq.parse_stream(stream)
         c = {}
         for x in range(l):
-            junk1 = Byte('').parse_stream(stream)
-            junk2 = Byte('').parse_stream(stream)
-            junk3 = BFloat32('').parse_stream(stream)
-            junk4 = Byte('').parse_stream(stream)
-            junk5 = StarByteArray('').parse_stream(stream)
+            junk1 = _byte.parse_stream(stream)
+            junk2 = _byte.parse_stream(stream)
+            junk3 = _bfloat32.parse_stream(stream)
+            junk4 = _byte.parse_stream(stream)
+            junk5 = _star_byte_array.parse_stream(stream)
         return c
 
 
 class DictVariant(Construct):
     def _parse(self, stream, context):
-        l = VLQ('').parse_stream(stream)
+        l = _vlq.parse_stream(stream)
         c = {}
         for x in range(l):
-            key = star_string('').parse_stream(stream)
-            value = Variant('').parse_stream(stream)
+            key = _star_string.parse_stream(stream)
+            value = _variant.parse_stream(stream)
             c[key] = value
         return c
 
@@ -131,18 +140,18 @@ class DictVariant(Construct):
 class WarpVariant(Construct):
     # Not all variants have been properly treated!
     def _parse(self, stream, context):
-        x = Byte('').parse_stream(stream)
+        x = _byte.parse_stream(stream)
         if x == 0:
             return None
         elif x == 1:
-            return star_string().parse_stream(stream)
+            return _star_string.parse_stream(stream)
         elif x == 2:
             return None
         elif x == 3:
-            flag = Flag('').parse_stream(stream)
-            return Field('', 16).parse_stream(stream).encode('hex')
+            flag = _flag.parse_stream(stream)
+            return _uuid_field.parse_stream(stream).encode('hex')
         elif x == 4:
-            return star_string().parse_stream(stream)
+            return _star_string.parse_stream(stream)
 
     def _build(self, obj, stream, context):
         if len(obj) == 32:
@@ -152,7 +161,7 @@ class WarpVariant(Construct):
             return
         elif obj is 'outpost':
             _write_stream(stream, 1, chr(1))
-            star_string()._build(obj, stream, context)
+            _star_string._build(obj, stream, context)
             return
         elif obj is None:
             _write_stream(stream, 1, chr(4))
@@ -171,7 +180,7 @@ class Variant(Construct):
     }
 
     def _parse(self, stream, context):
-        x = Byte('').parse_stream(stream)
+        x = _byte.parse_stream(stream)
         return self.RESPONSES.get(x, lambda x: None)(stream)
         # if x == 1:
         #     return None
@@ -191,8 +200,21 @@ class Variant(Construct):
 
 class StarByteArray(Construct):
     def _parse(self, stream, context):
-        l = VLQ('').parse_stream(stream)
+        l = _vlq.parse_stream(stream)
         return _read_stream(stream, l)
 
     def _build(self, obj, stream, context):
-        _write_stream(stream, len(obj), VLQ('').build(len(obj))+obj)
+        data = write_vlq(len(obj)) + obj
+        _write_stream(stream, len(data), data)
+
+
+# Shared instances for the hand-rolled constructs above, which would
+# otherwise build a fresh construct for every element they parse.
+_byte = Byte('')
+_flag = Flag('')
+_bfloat32 = BFloat32('')
+_uuid_field = Field('', 16)
+_vlq = VLQ('')
+_star_string = star_string('')
+_star_byte_array = StarByteArray('')
+_variant = Variant('')
@@ -0,0 +1,105 @@
+"""
+Hand-written codec for packet headers and (Signed)VLQ integers.
+
+These routines are used on the framing hot path instead of the construct
+based `packet()`/`start_packet()` structs. Decoders work directly on a
+bytearray (or anything whose items are ints) and an offset, so nothing has
+to be sliced or copied to look at a header.
+"""
+
+# Encodings of every value that fits in a single VLQ byte.
+_SINGLE_BYTE = [chr(i) for i in xrange(0x80)]
+
+
+def read_vlq(buf, offset=0):
+    """
+    Decodes a VLQ starting at `offset`.
+
+    :return: (value, offset just past the VLQ), or None if `buf` ends
+             before the VLQ does.
+    """
+    end = len(buf)
+    value = 0
+    while offset < end:
+        byte = buf[offset]
+        offset += 1
+        value = (value << 7) | (byte & 0x7f)
+        if not byte & 0x80:
+            return value, offset
+    return None
+
+
+def read_signed_vlq(buf, offset=0):
+    """
+    Decodes a SignedVLQ starting at `offset`.
+
+    :return: (value, offset just past the SignedVLQ), or None if `buf` ends
+             before the SignedVLQ does.
+    """
+    result = read_vlq(buf, offset)
+    if result is None:
+        return None
+    value, offset = result
+    if value & 1:
+        return -((value >> 1) + 1), offset
+    return value >> 1, offset
+
+
+def read_header(buf, offset=0):
+    """
+    Decodes the packet header starting at `offset`.
+
+    :return: (packet id, payload size, compressed, header length), or None
+             if the header hasn't been fully received yet. The payload size
+             is always positive; `compressed` carries its sign.
+    """
+    if len(buf) - offset < 2:
+        return None
+    result = read_signed_vlq(buf, offset + 1)
+    if result is None:
+        return None
+    payload_size, end = result
+    if payload_size < 0:
+        return buf[offset], -payload_size, True, end - offset
+    return buf[offset], payload_size, False, end - offset
+
+
+def write_vlq(value):
+    """
+    Encodes a non-negative integer as a VLQ.
+
+    :rtype : str
+    """
+    if value < 0x80:
+        if value < 0:
+            raise ValueError('VLQ values can\'t be negative.')
+        return _SINGLE_BYTE[value]
+    result = [chr(value & 0x7f)]
+    value >>= 7
+    while value:
+        result.append(chr(0x80 | (value & 0x7f)))
+        value >>= 7
+    result.reverse()
+    return ''.join(result)
+
+
+def write_signed_vlq(value):
+    """
+    Encodes an integer as a SignedVLQ.
+
+    :rtype : str
+    """
+    if value < 0:
+        return write_vlq(((-value - 1) << 1) | 1)
+    return write_vlq(value << 1)
+
+
+def write_header(packet_id, payload_size, compressed=False):
+    """
+    Encodes a packet header for a payload of `payload_size` bytes.
+
+    :rtype : str
+    """
+    if compressed:
+        return chr(packet_id) + write_signed_vlq(-payload_size)
+    return chr(packet_id) + write_signed_vlq(payload_size)
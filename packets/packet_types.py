@@ -26,6 +26,7 @@ from construct import (
 from enum import IntEnum
 
 from data_types import (
+    cached_struct,
     SignedVLQ,
     VLQ,
     Variant,
@@ -220,6 +221,7 @@ WARP_WORLD_MISSION = Struct(
 )
 
 
+@cached_struct
 def packet(name='base_packet'):
     return Struct(
         name,
@@ -229,6 +231,7 @@ def packet(name='base_packet'):
     )
 
 
+@cached_struct
 def start_packet(name='interim_packet'):
     return Struct(
         name,
@@ -237,6 +240,7 @@ def start_packet(name='interim_packet'):
     )
 
 
+@cached_struct
 def connection(name='connection'):
     return Struct(
         name,
@@ -244,6 +248,7 @@ def connection(name='connection'):
     )
 
 
+@cached_struct
 def celestial_coordinate(name='celestial_coordinate'):
     return Struct(
         name,
@@ -255,6 +260,7 @@ def celestial_coordinate(name='celestial_coordinate'):
     )
 
 
+@cached_struct
 def warp_action(name='warp_action'):
     return Struct(
         name,
@@ -272,6 +278,7 @@ def warp_action(name='warp_action'):
     )
 
 
+@cached_struct
 def warp_touniqueworld_write(name='warp_touniqueworld_write'):
     return Struct(
         name,
@@ -282,6 +289,7 @@ def warp_touniqueworld_write(name='warp_touniqueworld_write'):
     )
 
 
+@cached_struct
 def warp_toplayerworld_write(name='warp_toplayerworld_write'):
     return Struct(
         name,
@@ -292,6 +300,7 @@ def warp_toplayerworld_write(name='warp_toplayerworld_write'):
     )
 
 
+@cached_struct
 def warp_toplayer_write(name='warp_toplayer_write'):
     return Struct(
         name,
@@ -300,6 +309,7 @@ def warp_toplayer_write(name='warp_toplayer_write'):
     )
 
 
+@cached_struct
 def warp_toalias_write(name='warp_toalias_write'):
     return Struct(
         name,
@@ -312,11 +322,13 @@ projectile = DictVariant('projectile')
 
 
 # (0) - ProtocolVersion : S -> C
+@cached_struct
 def protocol_version(name='protocol_version'):
     return Struct(name, UBInt32('server_build'))
 
 
 # (9) - ClientConnect : C -> S
+@cached_struct
 def client_connect(name='client_connect'):
     return Struct(
         name,
@@ -340,16 +352,19 @@ def client_connect(name='client_connect'):
 
 
 # (4) - HandshakeChallenge : S -> C
+@cached_struct
 def handshake_challenge(name='handshake_challenge'):
     return Struct(name, StarByteArray('salt'))
 
 
 # (11) - HandshakeResponse : C -> S
+@cached_struct
 def handshake_response(name='handshake_response'):
     return Struct(name, star_string('hash'))
 
 
 # (2) - ConnectSuccess : S -> C
+@cached_struct
 def connect_success(name='connect_success'):
     return Struct(
         name,
@@ -369,26 +384,31 @@ def connect_success(name='connect_success'):
 
 
 # (3) - ConnectFailure : S -> C
+@cached_struct
 def connect_failure(name='connect_failure'):
     return Struct(name, star_string('reject_reason'))
 
 
 # (1) - ServerDisconnect
+@cached_struct
 def server_disconnect(name='server_disconnect'):
     return Struct(name, star_string('reason'))
 
 
 # (6) - UniverseTimeUpdate
+@cached_struct
 def universe_time_update(name='universe_time'):
     return Struct(name, BFloat64('universe_time'))
 
 
 # (10) - ClientDisconnectRequest
+@cached_struct
 def client_disconnect_request(name='client_disconnect_request'):
     return Struct(name, Byte('data'))
 
 
 # (5) - ChatReceived
+@cached_struct
 def chat_received(name='chat_received'):
     return Struct(
         name,
@@ -407,6 +427,7 @@ def chat_received(name='chat_received'):
 
 
 # (14) - ChatSent
+@cached_struct
 def chat_sent(name='chat_sent'):
     return Struct(
         name,
@@ -430,6 +451,7 @@ def chat_sent_write(message, send_mode):
 
 
 # (12) - PlayerWarp
+@cached_struct
 def player_warp(name='player_warp'):
     return Struct(name, warp_action())
 
@@ -475,6 +497,7 @@ def player_warp_toalias_write(alias):
 
 
 # (8) - PlayerWarpResult
+@cached_struct
 def player_warp_result(name='player_warp_result'):
     return Struct(
         name,
@@ -485,6 +508,7 @@ def player_warp_result(name='player_warp_result'):
 
 
 # (13) - FlyShip
+@cached_struct
 def fly_ship(name='fly_ship'):
     return Struct(name, celestial_coordinate())
 
@@ -504,11 +528,13 @@ def fly_ship_write(x=0, y=0, z=0, planet=0, satellite=0):
 
 
 # (15) - CelestialRequest
+@cached_struct
 def celestial_request(name='celestial_request'):
     return Struct(name, GreedyRange(star_string('requests')))
 
 
 # (16) - ClientContextUpdate
+@cached_struct
 def client_context_update(name='client_context'):
     return Struct(
         name,
@@ -534,6 +560,7 @@ def client_context_update(name='client_context'):
 
 
 # (17) - WorldStart
+@cached_struct
 def world_start(name='world_start'):
     return Struct(
         name,
@@ -550,16 +577,19 @@ def world_start(name='world_start'):
 
 
 # (18) - WorldStop
+@cached_struct
 def world_stop(name='world_stop'):
     return Struct(name, star_string('reason'))
 
 
 # (18) - CentralStructureUpdate
+@cached_struct
 def central_structure_update(name='central_structure_update'):
     return Struct(name, Variant('structureData'))
 
 
 # (32) - CollectLiquid
+@cached_struct
 def collect_liquid(name='collect_liquid'):
     return Struct(
         name,
@@ -576,6 +606,7 @@ def collect_liquid(name='collect_liquid'):
 
 
 # (25) - GiveItem
+@cached_struct
 def give_item(name='give_item'):
     return Struct(
         name,
@@ -598,6 +629,7 @@ def give_item_write(name, count):
 
 
 # (40) - SwapInContainer
+@cached_struct
 def swap_in_container(name='swap_in_container'):
     return Struct(
         name,
@@ -612,6 +644,7 @@ def swap_in_container(name='swap_in_container'):
 
 # (26) - SwapInContainerResult - aka what item is selected / in our hand (does
 # not mean wielding)
+@cached_struct
 def swap_in_container_result(name='swap_in_container_result'):
     return Struct(
         name,
@@ -623,6 +656,7 @@ def swap_in_container_result(name='swap_in_container_result'):
 
 
 # (29) - UpdateTileProtection
+@cached_struct
 def update_tile_protection(name='update_tile_protection'):
     return Struct(
         name,
@@ -636,6 +670,7 @@ def update_tile_protection(name='update_tile_protection'):
     )
 
 
+@cached_struct
 def update_tile_protection_writer(name='update_tile_protection_writer'):
     return Struct(name, UBInt16('dungeon_id'), Byte('is_protected'))
 
@@ -650,6 +685,7 @@ def update_tile_protection_write(dungeon_id, is_protected):
 
 
 # (36) - SpawnEntity
+@cached_struct
 def spawn_entity(name='spawn_entity'):
     return Struct(
         name,
@@ -665,6 +701,7 @@ def spawn_entity(name='spawn_entity'):
 
 
 # (47) - EntityCreate
+@cached_struct
 def entity_create(name='entity_create'):
     return Struct(
         name,
@@ -681,6 +718,7 @@ def entity_create(name='entity_create'):
 
 
 # (48) - EntityUpdate
+@cached_struct
 def entity_update(name='entity_update'):
     return Struct(
         name,
@@ -690,6 +728,7 @@ def entity_update(name='entity_update'):
 
 
 # (49) - EntityDestroy
+@cached_struct
 def entity_destroy(name='entity_destroy'):
     return Struct(
         name,
@@ -699,6 +738,7 @@ def entity_destroy(name='entity_destroy'):
 
 
 # (32) - EntityInteract
+@cached_struct
 def entity_interact(name='entity_interact'):
     return Struct(
         name,
@@ -710,6 +750,7 @@ def entity_interact(name='entity_interact'):
 
 
 # (28) - EntityInteractResult
+@cached_struct
 def entity_interact_result(name='entity_interact_result'):
     return Struct(
         name,
@@ -720,6 +761,7 @@ def entity_interact_result(name='entity_interact_result'):
 
 
 # (50) - HitRequest
+@cached_struct
 def hit_request(name='hit_request'):
     return Struct(
         name,
@@ -729,6 +771,7 @@ def hit_request(name='hit_request'):
 
 
 # (51) - DamageRequest
+@cached_struct
 def damage_request(name='damage_request'):
     return Struct(
         name,
@@ -746,6 +789,7 @@ def damage_request(name='damage_request'):
 
 
 # (52) - DamageNotification
+@cached_struct
 def damage_notification(name='damage_notification'):
     return Struct(
         name,
@@ -762,6 +806,7 @@ def damage_notification(name='damage_notification'):
 
 
 # (55) - UpdateWorldProperties
+@cached_struct
 def update_world_properties(name='world_properties'):
     return Struct(
         name,
@@ -789,5 +834,55 @@ def update_world_properties_write(dictionary):
 
 
 # (56) - StepUpdate
+@cached_struct
 def step_update(name='step_update'):
     return Struct(name, VLQ('remote_step'))
+
+
+# Prebuilt parsers, keyed by packet id. Plugins should prefer
+# `packet_struct(packet_id)` (or the matching factory above, which returns
+# the very same instance) over building their own.
+PACKET_STRUCTS = {
+    Packets.PROTOCOL_VERSION: protocol_version(),
+    Packets.SERVER_DISCONNECT: server_disconnect(),
+    Packets.CONNECT_SUCCESS: connect_success(),
+    Packets.CONNECT_FAILURE: connect_failure(),
+    Packets.HANDSHAKE_CHALLENGE: handshake_challenge(),
+    Packets.CHAT_RECEIVED: chat_received(),
+    Packets.UNIVERSE_TIME_UPDATE: universe_time_update(),
+    Packets.PLAYER_WARP_RESULT: player_warp_result(),
+    Packets.CLIENT_CONNECT: client_connect(),
+    Packets.CLIENT_DISCONNECT_REQUEST: client_disconnect_request(),
+    Packets.HANDSHAKE_RESPONSE: handshake_response(),
+    Packets.PLAYER_WARP: player_warp(),
+    Packets.FLY_SHIP: fly_ship(),
+    Packets.CHAT_SENT: chat_sent(),
+    Packets.CELESTIAL_REQUEST: celestial_request(),
+    Packets.CLIENT_CONTEXT_UPDATE: client_context_update(),
+    Packets.WORLD_START: world_start(),
+    Packets.WORLD_STOP: world_stop(),
+    Packets.CENTRAL_STRUCTURE_UPDATE: central_structure_update(),
+    Packets.GIVE_ITEM: give_item(),
+    Packets.SWAP_IN_CONTAINER_RESULT: swap_in_container_result(),
+    Packets.ENTITY_INTERACT_RESULT: entity_interact_result(),
+    Packets.UPDATE_TILE_PROTECTION: update_tile_protection(),
+    Packets.COLLECT_LIQUID: collect_liquid(),
+    Packets.SPAWN_ENTITY: spawn_entity(),
+    Packets.ENTITY_INTERACT: entity_interact(),
+    Packets.SWAP_IN_CONTAINER: swap_in_container(),
+    Packets.ENTITY_CREATE: entity_create(),
+    Packets.ENTITY_UPDATE: entity_update(),
+    Packets.ENTITY_DESTROY: entity_destroy(),
+    Packets.HIT_REQUEST: hit_request(),
+    Packets.DAMAGE_REQUEST: damage_request(),
+    Packets.DAMAGE_NOTIFICATION: damage_notification(),
+    Packets.UPDATE_WORLD_PROPERTIES: update_world_properties(),
+    Packets.STEP_UPDATE: step_update()
+}
+
+
+def packet_struct(packet_id):
+    """
+    Returns the shared parser for a packet id, or None if there isn't one.
+    """
+    return PACKET_STRUCTS.get(packet_id)
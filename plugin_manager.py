@@ -5,12 +5,13 @@ functionality in StarryPy.
 import inspect
 import logging
 import sys
+from collections import deque
 
 from twisted.internet import reactor
-from twisted.internet.task import deferLater
 
 from base_plugin import BasePlugin
 from config import ConfigurationManager
+from packets import Direction, Packets
 from utility_functions import path
 
 
@@ -53,6 +54,13 @@ class PluginManager(object):
         :param base_class: The base class to use while searching for plugins.
         """
         self.packets = {}
+        # One byte per packet id and direction, set when any plugin hooks
+        # that packet or it is listed in `inspected_packets`. Updated in
+        # place, so protocols can hold on to them.
+        self.interest = {
+            Direction.CLIENT: bytearray(256),
+            Direction.SERVER: bytearray(256)
+        }
         self.plugins = {}
         self.plugin_classes = {}
         self.plugins_waiting_to_load = {}
@@ -62,6 +70,23 @@ class PluginManager(object):
         self.config = ConfigurationManager()
         self.base_class = base_class
         self.factory = factory
+        self.inspected_packets = []
+        for name in self.config.inspected_packets:
+            packet = getattr(Packets, name, None)
+            if packet is None:
+                self.logger.warning('Unknown inspected packet %s.', name)
+                continue
+            self.inspected_packets.append(packet)
+        self.update_interest()
+
+        # 'after' hooks are queued and run in batches by a single reactor
+        # call, instead of scheduling one delayed call per packet.
+        self.after_queue = deque()
+        self.after_interval = self.config.after_hook_interval
+        self.after_batch_size = self.config.after_hook_batch_size
+        self.after_call = None
+        self.after_queue_peak = 0
+        self.after_hooks_run = 0
 
         self.plugin_dir = path.child(self.config.plugin_path)
         sys.path.append(self.plugin_dir.path)
@@ -121,6 +146,9 @@ class PluginManager(object):
                         (plugin not in self.plugin_classes.iterkeys())
                 ):
                     plugin.config = self.config
+                    plugin.plugin_config = self.config.plugin_config_for(
+                        plugin.name
+                    )
                     plugin.factory = self.factory
                     plugin.active = False
                     plugin.protocol = None
@@ -269,7 +297,66 @@ class PluginManager(object):
                 )
         return all(return_values)
 
+    def schedule_after(self, protocol, data):
+        """
+        Queues the 'after' hooks of a packet, to be run in order on the next
+        tick of the after-hook queue. Packets without 'after' hooks are not
+        queued at all.
+
+        :param protocol: The protocol the packet was received on.
+        :param data: The packet.
+        :return: None
+        """
+        if not self.packets.get(data.id, {}).get('after'):
+            return
+        self.after_queue.append((protocol, data))
+        if len(self.after_queue) > self.after_queue_peak:
+            self.after_queue_peak = len(self.after_queue)
+        if self.after_call is None:
+            self.after_call = reactor.callLater(
+                self.after_interval, self.run_after_hooks
+            )
+
+    def run_after_hooks(self):
+        """
+        Runs queued 'after' hooks, at most `after_batch_size` of them, and
+        schedules another tick if any are left.
+
+        :return: None
+        """
+        self.after_call = None
+        queue = self.after_queue
+        for _ in xrange(min(len(queue), self.after_batch_size)):
+            protocol, data = queue.popleft()
+            self.do(protocol, 'after', data)
+            self.after_hooks_run += 1
+        if queue:
+            self.logger.debug(
+                '%d after hooks still queued after a full batch.', len(queue)
+            )
+            self.after_call = reactor.callLater(
+                self.after_interval, self.run_after_hooks
+            )
+
+    def after_queue_metrics(self):
+        """
+        :return: Current depth, peak depth and number of hooks run so far
+                 for the after-hook queue.
+        :rtype: dict
+        """
+        return {
+            'depth': len(self.after_queue),
+            'peak': self.after_queue_peak,
+            'run': self.after_hooks_run
+        }
+
     def die(self):
+        if self.after_call is not None and self.after_call.active():
+            self.after_call.cancel()
+        self.after_call = None
+        while self.after_queue:
+            protocol, data = self.after_queue.popleft()
+            self.do(protocol, 'after', data)
         self.deactivate_plugins()
 
     def map_plugin_packets(self, plugin):
@@ -283,6 +370,7 @@ class PluginManager(object):
                 ).setdefault(
                     when, {}
                 )[plugin.name] = (plugin, packet_method)
+        self.update_interest()
 
     def de_map_plugin_packets(self, plugin):
         """
@@ -292,32 +380,36 @@ class PluginManager(object):
             for when, plugins in when_dict.iteritems():
                 if plugin.name in plugins:
                     plugins.pop(plugin.name)
+        self.update_interest()
+
+    def update_interest(self):
+        """
+        Recomputes the per-direction bitmaps of hooked packet ids from
+        `self.packets` and the configured `inspected_packets`. Plugin hooks
+        aren't tied to a direction, so a hooked id is flagged in both.
+        """
+        hooked = bytearray(256)
+        for packet_id in self.inspected_packets:
+            hooked[packet_id] = 1
+        for packet_id, when_dict in self.packets.iteritems():
+            if any(when_dict.itervalues()):
+                hooked[packet_id] = 1
+        for bitmap in self.interest.itervalues():
+            bitmap[:] = hooked
 
 
 def route(func):
     """
     This decorator is used to map methods to appropriate plugin calls.
     """
-    logger = logging.getLogger('starrypy.plugin_manager.route')
 
     def wrapped_function(self, data):
         res = self.plugin_manager.do(self, 'on', data)
         if res:
             res = func(self, data)
-            d = deferLater(
-                reactor,
-                .01,
-                self.plugin_manager.do,
-                self,
-                'after',
-                data
-            )
-            d.addErrback(print_this_defered_failure)
+            self.plugin_manager.schedule_after(self, data)
         return res
 
-    def print_this_defered_failure(f):
-        logger.error('Deferred function failure. %s', f)
-
     return wrapped_function
 
 
@@ -122,7 +122,7 @@ class Warpy(SimpleCommandPlugin):
                         Packets.PLAYER_WARP,
                         player_warp_toalias_write(alias=WarpAliasType.SHIP)
                     )
-                from_protocol.client_protocol.transport.write(warp_packet)
+                from_protocol.client_protocol.write(warp_packet)
                 if from_string != to_string:
                     self.protocol.send_chat_message(
                         'Warped ^yellow;{}^green;'
@@ -245,7 +245,7 @@ class Warpy(SimpleCommandPlugin):
                     destination='outpost'
                 )
             )
-            player_protocol.client_protocol.transport.write(warp_packet)
+            player_protocol.client_protocol.write(warp_packet)
             self.protocol.send_chat_message(
                 'Warped ^yellow;{}^green; to the outpost.'.format(
                     player_string
@@ -2,7 +2,6 @@ from datetime import datetime
 
 from base_plugin import BasePlugin
 from plugins.core.player_manager_plugin import permissions, UserLevels
-import packets
 
 
 class AdminMessenger(BasePlugin):
@@ -17,7 +16,7 @@ class AdminMessenger(BasePlugin):
         self.prefix = self.config.chat_prefix
 
     def on_chat_sent(self, data):
-        data = packets.chat_sent().parse(data.data)
+        data = data.parsed
         if data.message[:3] == self.prefix * 3:
             self.broadcast_message(data)
             return False
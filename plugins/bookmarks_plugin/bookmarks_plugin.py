@@ -167,7 +167,7 @@ class Bookmarks(SimpleCommandPlugin):
                         satellite=satellite
                     )
                 )
-                self.protocol.client_protocol.transport.write(warp_packet)
+                self.protocol.client_protocol.write(warp_packet)
                 self.protocol.send_chat_message(
                     'Warp drive engaged! Warping to ^yellow;{}^green;.'.format(
                         name
@@ -1,5 +1,4 @@
 from base_plugin import BasePlugin
-from packets import chat_sent
 
 
 class ChatLogger(BasePlugin):
@@ -9,7 +8,7 @@ class ChatLogger(BasePlugin):
     name = 'chat_logger'
 
     def on_chat_sent(self, data):
-        parsed = chat_sent().parse(data.data)
+        parsed = data.parsed
         self.logger.info(
             'Chat message sent: <%s> %s',
             self.protocol.player.name,
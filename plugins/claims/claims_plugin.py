@@ -16,16 +16,14 @@ class ClaimsPlugin(SimpleCommandPlugin):
     def activate(self):
         super(ClaimsPlugin, self).activate()
         try:
-            self.max_claims = self.config.plugin_config['max_claims']
+            self.max_claims = self.plugin_config['max_claims']
         except KeyError:
             self.max_claims = 5
-        self.unclaimable_planets = self.config.plugin_config.get(
+        self.unclaimable_planets = self.plugin_config.get(
             'unclaimable_planets', []
         )
-        self.protected_planets = self.config.config['plugin_config'][
-            'planet_protect']['protected_planets']
-        self.player_planets = self.config.config['plugin_config'][
-            'planet_protect']['player_planets']
+        self.planet_protect = self.plugins['planet_protect']
+        self.protection = self.planet_protect.protection
         self.player_manager = self.plugins[
             'player_manager_plugin'
         ].player_manager
@@ -69,19 +67,17 @@ class ClaimsPlugin(SimpleCommandPlugin):
             )
             return
         try:
-            my_storage = self.protocol.player.storage
+            my_storage = self.protocol.player.storage_for(self.name)
         except AttributeError:
             return
 
         # set storage to 0 if player never used any of the claim commands
         if 'claims' not in my_storage:
             my_storage['claims'] = 0
-            self.protocol.player.storage = my_storage
 
         # check if max claim limit has been reached
         if int(my_storage['claims']) >= self.max_claims:
             my_storage['claims'] = self.max_claims
-            self.protocol.player.storage = my_storage
             self.protocol.send_chat_message(
                 'You already have max (^red;%s^green;) '
                 'claimed planets!'.format(self.max_claims)
@@ -117,34 +113,27 @@ class ClaimsPlugin(SimpleCommandPlugin):
             first_name = str(addplayer)
             orgplayer = self.protocol.player.org_name
 
-            try:
-                count = 1
-                for name in self.player_planets[planet]:
-                    if name != str(orgplayer) and count == 1:
-                        self.protocol.send_chat_message(
-                            'You can only claim free planets!'
-                        )
-                        return
-                    count += 1
-            except:
+            owners = self.protection.player_planets.get(planet)
+            if owners is None:
                 if first_name != orgplayer:
                     self.protocol.send_chat_message(
                         'Use only /claim if you wish to claim a planet!'
                     )
                     return
+            elif owners and owners[0] != str(orgplayer):
+                self.protocol.send_chat_message(
+                    'You can only claim free planets!'
+                )
+                return
 
-            try:
-                for _ in self.player_planets:
-                    if first_name in self.player_planets[
-                        self.protocol.player.planet
-                    ]:
-                        self.protocol.send_chat_message(
-                            'Player ^yellow;{}^green; is already in '
-                            'planet protect list.' .format(first_name_color)
-                        )
-                        return
-            except:
-                pass
+            if self.protection.is_allowed(
+                    self.protocol.player.planet, first_name
+            ):
+                self.protocol.send_chat_message(
+                    'Player ^yellow;{}^green; is already in '
+                    'planet protect list.' .format(first_name_color)
+                )
+                return
 
             # reset planet back to current planet
             planet = self.protocol.player.planet
@@ -153,19 +142,13 @@ class ClaimsPlugin(SimpleCommandPlugin):
                     'Can\'t claim ships (at the moment)'
                 )
                 return
-            if planet not in self.protected_planets:
-                self.protected_planets.append(planet)
+            if planet not in self.protection:
+                self.protection.protect(planet)
                 self.protocol.send_chat_message('Planet successfully claimed.')
                 self.logger.info('Protected planet %s', planet)
                 my_storage['claims'] = int(my_storage['claims']) + 1
-                self.protocol.player.storage = my_storage
                 if first_name:
-                    if planet not in self.player_planets:
-                        self.player_planets[planet] = [first_name]
-                    else:
-                        self.player_planets[planet] = (
-                            self.player_planets[planet] + [first_name]
-                        )
+                    self.protection.allow(planet, first_name)
                     self.protocol.send_chat_message(
                         'Adding ^yellow;{}^green; to planet list'.format(
                             first_name_color
@@ -177,12 +160,7 @@ class ClaimsPlugin(SimpleCommandPlugin):
                         'Planet is already claimed!'
                     )
                 else:
-                    if planet not in self.player_planets:
-                        self.player_planets[planet] = [first_name]
-                    else:
-                        self.player_planets[planet] = (
-                            self.player_planets[planet] + [first_name]
-                        )
+                    self.protection.allow(planet, first_name)
                     self.protocol.send_chat_message(
                         'Adding ^yellow;%s^green; to planet list'.format(
                             first_name_color
@@ -198,13 +176,12 @@ class ClaimsPlugin(SimpleCommandPlugin):
         Syntax: /claim_list
         """
         try:
-            my_storage = self.protocol.player.storage
+            my_storage = self.protocol.player.storage_for(self.name)
         except AttributeError:
             return
 
         if 'claims' not in my_storage:
             my_storage['claims'] = 0
-            self.protocol.player.storage = my_storage
 
         planet = self.protocol.player.planet
         on_ship = self.protocol.player.on_ship
@@ -213,7 +190,7 @@ class ClaimsPlugin(SimpleCommandPlugin):
                 'Can\'t claim ships (at the moment)'
             )
             return
-        if planet in self.player_planets:
+        if self.protection.players(planet):
             self.protocol.send_chat_message(
                 'Claimed ^cyan;{}^green; of max ^red;{}^green; '
                 'claimed planets.'.format(
@@ -222,7 +199,7 @@ class ClaimsPlugin(SimpleCommandPlugin):
             )
             self.protocol.send_chat_message(
                 'Players registered to this planet: ^yellow;{}'.format(
-                    '^green;, ^yellow;'.join(self.player_planets[planet])
+                    '^green;, ^yellow;'.join(self.protection.players(planet))
                     .replace('[', '')
                     .replace(']', '')
                 )
@@ -254,12 +231,11 @@ class ClaimsPlugin(SimpleCommandPlugin):
         Syntax: /unclaim [player]
         """
         try:
-            my_storage = self.protocol.player.storage
+            my_storage = self.protocol.player.storage_for(self.name)
         except AttributeError:
             return
         if int(my_storage.get('claims', 0)) <= 0:
             my_storage['claims'] = 0
-            self.protocol.player.storage = my_storage
             self.protocol.send_chat_message('You have no claimed planets!')
         else:
             planet = self.protocol.player.planet
@@ -281,40 +257,34 @@ class ClaimsPlugin(SimpleCommandPlugin):
                     'Can\'t claim ships (at the moment)'
                 )
                 return
-            try:
-                count = 1
-                for name in self.player_planets[planet]:
-                    if name != str(orgplayer) and count == 1:
-                        self.protocol.send_chat_message(
-                            'You can only unclaim planets you\'ve claimed!'
-                        )
-                        return
-                    if data and first_name == str(orgplayer):
-                        self.protocol.send_chat_message(
-                            'Use only /unclaim if you wish to '
-                            'remove protection!'
-                        )
-                        return
-                    count += 1
-            except:
-                pass
+            owners = self.protection.players(planet)
+            if owners:
+                if owners[0] != str(orgplayer):
+                    self.protocol.send_chat_message(
+                        'You can only unclaim planets you\'ve claimed!'
+                    )
+                    return
+                if data and first_name == str(orgplayer):
+                    self.protocol.send_chat_message(
+                        'Use only /unclaim if you wish to '
+                        'remove protection!'
+                    )
+                    return
             if not data:
-                if planet in self.protected_planets:
-                    del self.player_planets[planet]
-                    self.protected_planets.remove(planet)
+                if planet in self.protection:
+                    self.protection.unprotect(planet)
                     self.protocol.send_chat_message(
                         'Planet successfully unclaimed.'
                     )
                     self.logger.info('Unprotected planet %s', planet)
                     my_storage['claims'] = int(my_storage['claims']) - 1
-                    self.protocol.player.storage = my_storage
                 else:
                     self.protocol.send_chat_message(
                         'Planet has not been claimed!'
                     )
             else:
-                if first_name in self.player_planets[planet]:
-                    self.player_planets[planet].remove(first_name)
+                if self.protection.is_allowed(planet, first_name):
+                    self.protection.disallow(planet, first_name)
                     self.protocol.send_chat_message(
                         'Removed ^yellow;{}^green; from planet list'.format(
                             first_name_color
@@ -330,14 +300,8 @@ class ClaimsPlugin(SimpleCommandPlugin):
         self.save()
 
     def save(self):
-        self.config.config['plugin_config']['planet_protect'].update(
-            {
-                'protected_planets': self.protected_planets,
-                'player_planets': self.player_planets
-            }
-        )
-
-        self.config.plugin_config.update(
+        self.planet_protect.save()
+        self.plugin_config.update(
             {
                 'max_claims': self.max_claims,
                 'unclaimable_planets': self.unclaimable_planets
@@ -5,7 +5,6 @@ from twisted.internet import reactor
 
 from base_plugin import SimpleCommandPlugin, BasePlugin
 from plugins.core.player_manager_plugin import permissions, UserLevels
-from packets import chat_sent
 from utility_functions import give_item_to_player, extract_name
 
 
@@ -590,7 +589,7 @@ class MuteManager(BasePlugin):
     name = 'mute_manager'
 
     def on_chat_sent(self, data):
-        data = chat_sent().parse(data.data)
+        data = data.parsed
         if (
                 self.protocol.player.muted and
                 data.message[0] != self.config.command_prefix and
@@ -1,8 +1,10 @@
 from datetime import datetime
 
 from base_plugin import BasePlugin
-from packets.packet_types import chat_received, Packets
-from utility_functions import build_packet
+
+
+# Player attributes a colored name is rendered from.
+RENDERED_ATTRIBUTES = frozenset(['name', 'access_level'])
 
 
 class ColoredNames(BasePlugin):
@@ -17,27 +19,68 @@ class ColoredNames(BasePlugin):
         self.player_manager = self.plugins[
             'player_manager_plugin'
         ].player_manager
+        # Rendered names by (org_name, access level, colors version). The
+        # version goes up whenever the configured colors are replaced.
+        self.colored_names = {}
+        self.colors = None
+        self.colors_version = 0
+        self.player_manager.subscribe(self.player_changed)
+
+    def deactivate(self):
+        super(ColoredNames, self).deactivate()
+        self.player_manager.unsubscribe(self.player_changed)
+
+    def colored_name(self, org_name):
+        """
+        Returns the colored name of a logged in player, rendering it only
+        when it isn't cached. None if nobody is logged in with that name.
+
+        Only the player manager's in-memory indexes are used, so chat never
+        waits on the database.
+        """
+        sender = self.player_manager.get_logged_in_by_org_name(org_name)
+        if sender is None:
+            return None
+        colors = self.config.colors
+        if colors is not self.colors:
+            self.colors = colors
+            self.colors_version += 1
+            self.colored_names.clear()
+        key = (org_name, sender.access_level, self.colors_version)
+        name = self.colored_names.get(key)
+        if name is None:
+            name = sender.colored_name(colors)
+            self.colored_names[key] = name
+        return name
+
+    def forget(self, org_name):
+        for key in [k for k in self.colored_names if k[0] == org_name]:
+            del self.colored_names[key]
+
+    def player_changed(self, player, name):
+        if name in RENDERED_ATTRIBUTES:
+            self.forget(player.org_name)
+
+    def on_client_disconnect_request(self, data):
+        if self.protocol.player is not None:
+            self.forget(self.protocol.player.org_name)
+        return True
 
     def on_chat_received(self, data):
         now = datetime.now()
         try:
-            p = chat_received().parse(data.data)
+            p = data.parsed
             if p.name == 'server':
                 return
-            sender = self.player_manager.get_by_org_name(str(p.name))
+            name = self.colored_name(str(p.name))
+            if name is None:
+                return True
             if self.config.chattimestamps:
-                p.name = '{}> <{}'.format(
-                    now.strftime('%H:%M'),
-                    sender.colored_name(self.config.colors)
-                )
+                p.name = '{}> <{}'.format(now.strftime('%H:%M'), name)
             else:
-                p.name = sender.colored_name(self.config.colors)
-            self.protocol.transport.write(
-                build_packet(Packets.CHAT_RECEIVED, chat_received().build(p))
-            )
+                p.name = name
         except AttributeError as e:
             self.logger.warning(
                 'Received AttributeError in colored_name. %s', str(e)
             )
-            self.protocol.transport.write(data.original_data)
-        return False
+        return True
@@ -0,0 +1,49 @@
+from unittest import TestCase
+
+from mock import Mock
+
+from plugins.core.colored_names import ColoredNames
+
+
+class ColoredNamesTestCase(TestCase):
+    def setUp(self):
+        self.plugin = ColoredNames()
+        self.player = Mock(org_name='Org', access_level=0)
+        self.player.colored_name.side_effect = (
+            lambda colors: '{}Nick'.format(colors['guest'])
+        )
+        self.player_manager = Mock()
+        self.player_manager.get_logged_in_by_org_name.return_value = (
+            self.player
+        )
+        self.plugin.plugins = {
+            'player_manager_plugin': Mock(player_manager=self.player_manager)
+        }
+        self.plugin.config = Mock(colors={'guest': '^gray;'})
+        self.plugin.logger = Mock()
+        self.plugin.activate()
+
+    def test_names_are_rendered_once(self):
+        self.assertEqual(self.plugin.colored_name('Org'), '^gray;Nick')
+        self.assertEqual(self.plugin.colored_name('Org'), '^gray;Nick')
+        self.assertEqual(self.player.colored_name.call_count, 1)
+
+    def test_unknown_sender(self):
+        self.player_manager.get_logged_in_by_org_name.return_value = None
+        self.assertIsNone(self.plugin.colored_name('Nobody'))
+        self.assertFalse(self.player_manager.get_by_org_name.called)
+        self.assertEqual(self.plugin.colored_names, {})
+
+    def test_changes_are_rendered_again(self):
+        self.plugin.colored_name('Org')
+        self.plugin.player_changed(self.player, 'name')
+        self.plugin.colored_name('Org')
+        self.assertEqual(self.player.colored_name.call_count, 2)
+
+        self.player.access_level = 100
+        self.plugin.colored_name('Org')
+        self.assertEqual(self.player.colored_name.call_count, 3)
+
+        self.plugin.config.colors = {'guest': '^white;'}
+        self.assertEqual(self.plugin.colored_name('Org'), '^white;Nick')
+        self.assertEqual(list(self.plugin.colored_names), [('Org', 100, 2)])
@@ -1,5 +1,4 @@
 from base_plugin import BasePlugin
-from packets import chat_sent
 
 
 class CommandDispatchPlugin(BasePlugin):
@@ -11,10 +10,9 @@ class CommandDispatchPlugin(BasePlugin):
         self.command_prefix = self.config.command_prefix
 
     def on_chat_sent(self, data):
-        data = chat_sent().parse(data.data)
-        data.message = data.message.decode('utf-8')
-        if data.message.startswith(self.command_prefix):
-            split_command = data.message[1:].split()
+        message = data.parsed.message.decode('utf-8')
+        if message.startswith(self.command_prefix):
+            split_command = message[1:].split()
             command = split_command[0]
             try:
                 if command in self.commands:
@@ -23,7 +21,7 @@ class CommandDispatchPlugin(BasePlugin):
                     self.logger.info(
                         'Command sent: <%s> %s',
                         self.protocol.player.name,
-                        data.message
+                        message
                     )
                 else:
                     return True
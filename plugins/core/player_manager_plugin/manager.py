@@ -1,15 +1,18 @@
 from contextlib import contextmanager
+import copy
 import datetime
 from functools import wraps
 import inspect
 import logging
 import json
 import sqlite3
+import threading
 
-from sqlalchemy.ext.mutable import Mutable
-from sqlalchemy.orm import sessionmaker, relationship, backref
+from sqlalchemy.orm import sessionmaker, relationship, backref, validates
+from sqlalchemy.pool import NullPool, SingletonThreadPool
 from sqlalchemy import (
     create_engine,
+    event,
     Column,
     Integer,
     String,
@@ -22,6 +25,10 @@ from sqlalchemy import (
 from sqlalchemy.ext.declarative import (
     declarative_base as sqla_declarative_base
 )
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred, DeferredList, succeed
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.threadpool import ThreadPool
 from twisted.words.ewords import AlreadyLoggedIn
 from sqlalchemy.types import TypeDecorator, VARCHAR
 
@@ -47,7 +54,7 @@ def _autoclosing_session(sm):
         session.close()
 
 
-class JSONEncodedDict(TypeDecorator):
+class JSONEncodedValue(TypeDecorator):
     impl = VARCHAR
 
     def process_bind_param(self, value, dialect):
@@ -61,6 +68,94 @@ class JSONEncodedDict(TypeDecorator):
         return value
 
 
+# How the player database is opened, overridden by `player_db_profile` in
+# the config. `pool` is either 'singleton_thread', one connection kept per
+# thread, or 'null', a new connection per session.
+DEFAULT_STORAGE_PROFILE = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 268435456,
+    'cache_size': -16384,
+    'busy_timeout': 5000,
+    'cached_statements': 256,
+    'pool': 'singleton_thread'
+}
+PROFILE_PRAGMAS = [
+    'journal_mode', 'synchronous', 'mmap_size', 'cache_size', 'busy_timeout'
+]
+
+
+def create_player_db_engine(db_path, profile, threads):
+    """
+    Creates the engine for the player database, tuned by a storage profile.
+
+    :param db_path: Path to the SQLite database.
+    :param profile: Dict of storage settings, see DEFAULT_STORAGE_PROFILE.
+    :param threads: How many threads will use the engine.
+    :return: The engine.
+    """
+    profile = dict(DEFAULT_STORAGE_PROFILE, **profile)
+    if profile['pool'] == 'null':
+        pool_args = {'poolclass': NullPool}
+    else:
+        pool_args = {'poolclass': SingletonThreadPool, 'pool_size': threads}
+    engine = create_engine(
+        'sqlite:///{}'.format(db_path),
+        connect_args={'cached_statements': profile['cached_statements']},
+        **pool_args
+    )
+
+    @event.listens_for(engine, 'connect')
+    def apply_profile(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in PROFILE_PRAGMAS:
+            if profile.get(pragma) is not None:
+                cursor.execute(
+                    'PRAGMA {} = {};'.format(pragma, profile[pragma])
+                )
+        cursor.close()
+
+    return engine
+
+
+def _fold(name):
+    if name is None:
+        return None
+    return name.lower()
+
+
+# Plugins already warned about using Player.storage.
+_storage_warned = set()
+
+
+def _deprecated_storage(player, depth):
+    """
+    Returns the PluginStore of the plugin using the deprecated
+    `player.storage`, found `depth` frames up the stack as the old property
+    did, and warns about it once per plugin.
+    """
+    frame = inspect.currentframe()
+    for _ in xrange(depth + 1):
+        frame = frame.f_back
+    plugin = frame.f_locals['self'].__class__.name
+    if plugin not in _storage_warned:
+        _storage_warned.add(plugin)
+        logger.warning(
+            'Plugin %s uses player.storage, which is deprecated. Use '
+            'player.storage_for(name) instead.', plugin
+        )
+    return player.storage_for(plugin)
+
+
+def _set_deprecated_storage(player, values, depth):
+    store = _deprecated_storage(player, depth + 1)
+    if values is not store:
+        # Assigning replaced the plugin's whole storage.
+        store.clear()
+        for key, value in values.iteritems():
+            store[key] = value
+
+
 def migrate_db(config):
     dbcon = sqlite3.connect(path.preauthChild(config.player_db).path)
     dbcur = dbcon.cursor()
@@ -104,9 +199,83 @@ def migrate_db(config):
             dbcur.execute('UPDATE `players` SET `admin_logged_in`=0;')
             dbcon.commit()
 
+    try:
+        dbcur.execute('SELECT name_lower FROM players;')
+    except sqlite3.OperationalError, e:
+        if 'column' in str(e):
+            logger.info('Updating DB to include lowercase name columns.')
+            dbcur.execute('ALTER TABLE `players` ADD COLUMN `name_lower`;')
+            dbcur.execute(
+                'ALTER TABLE `players` ADD COLUMN `org_name_lower`;'
+            )
+            rows = dbcur.execute(
+                'SELECT `uuid`, `name`, `org_name` FROM `players`;'
+            ).fetchall()
+            dbcur.executemany(
+                'UPDATE `players` SET `name_lower`=?, `org_name_lower`=? '
+                'WHERE `uuid`=?;',
+                [
+                    (_fold(name), _fold(org_name), uuid)
+                    for uuid, name, org_name in rows
+                ]
+            )
+            dbcur.execute(
+                'CREATE INDEX `ix_players_name_lower` '
+                'ON `players` (`name_lower`);'
+            )
+            dbcur.execute(
+                'CREATE INDEX `ix_players_org_name_lower` '
+                'ON `players` (`org_name_lower`);'
+            )
+            dbcon.commit()
+
+    try:
+        dbcur.execute('SELECT uuid FROM plugin_storage;')
+    except sqlite3.OperationalError, e:
+        if 'table' in str(e):
+            try:
+                rows = dbcur.execute(
+                    'SELECT `uuid`, `plugin_storage` FROM `players`;'
+                ).fetchall()
+            except sqlite3.OperationalError:
+                # A new database, created with the table.
+                rows = None
+            if rows is not None:
+                logger.info('Moving plugin storage to its own table.')
+                dbcur.execute(
+                    'CREATE TABLE `plugin_storage` ('
+                    '`uuid` VARCHAR NOT NULL, '
+                    '`plugin` VARCHAR NOT NULL, '
+                    '`key` VARCHAR NOT NULL, '
+                    '`value` VARCHAR, '
+                    'PRIMARY KEY (`uuid`, `plugin`, `key`), '
+                    'FOREIGN KEY(`uuid`) REFERENCES `players` (`uuid`));'
+                )
+                dbcur.executemany(
+                    'INSERT INTO `plugin_storage` VALUES (?, ?, ?, ?);',
+                    _plugin_storage_rows(rows)
+                )
+                dbcon.commit()
+
     dbcon.close()
 
 
+def _plugin_storage_rows(rows):
+    for uuid, blob in rows:
+        try:
+            storage = json.loads(blob or '{}')
+        except ValueError:
+            logger.warning('Dropping unreadable plugin storage of %s.', uuid)
+            continue
+        if not isinstance(storage, dict):
+            continue
+        for plugin, store in storage.iteritems():
+            if not isinstance(store, dict):
+                continue
+            for key, value in store.iteritems():
+                yield uuid, plugin, key, json.dumps(value)
+
+
 @declarative_base
 class Base(object):
     """
@@ -155,34 +324,19 @@ class _UserLevels(object):
 UserLevels = _UserLevels()
 
 
-class MutableDict(Mutable, dict):
-    @classmethod
-    def coerce(cls, key, value):
-        if not isinstance(value, MutableDict):
-            if isinstance(value, dict):
-                return MutableDict(value)
-            return Mutable.coerce(key, value)
-        else:
-            return value
-
-    def __setitem__(self, key, value):
-        dict.__setitem__(self, key, value)
-        self.changed()
-
-    def __delitem__(self, key):
-        dict.__delitem__(self, key)
-        self.changed()
-
-
-MutableDict.associate_with(JSONEncodedDict)
-
-
 class RecordWithAttachedSession(object):
-    def __init__(self, record, sessionmaker):
+    def __init__(self, record, manager):
         self.__dict__['record'] = record
-        self.__dict__['sessionmaker'] = sessionmaker
+        self.__dict__['manager'] = manager
+
+    @property
+    def sessionmaker(self):
+        return self.manager.sessionmaker
 
     def __getattr__(self, name):
+        if isinstance(self.record, Player):
+            # Changes still in the journal would be lost by the refresh.
+            self.manager.flush_player(self.record.uuid)
         with _autoclosing_session(self.sessionmaker) as session:
             if sessionmaker.object_session(self.record) != session:
                 session.add(self.record)
@@ -191,7 +345,25 @@ class RecordWithAttachedSession(object):
 
         return val
 
+    def storage_for(self, plugin):
+        return self.manager.plugin_storage(self.record.uuid, plugin)
+
+    @property
+    def storage(self):
+        """
+        Deprecated: use `storage_for(name)`.
+        """
+        return _deprecated_storage(self, 1)
+
     def __setattr__(self, name, val):
+        if name == 'storage':
+            _set_deprecated_storage(self, val, 1)
+            return val
+        if isinstance(self.record, Player):
+            setattr(self.record, name, val)
+            self.manager.record_change(self.record, name)
+            return val
+
         with _autoclosing_session(self.sessionmaker) as session:
             if sessionmaker.object_session(self.record) != session:
                 session.add(self.record)
@@ -203,12 +375,75 @@ class RecordWithAttachedSession(object):
         return val
 
 
+class CachedPlayer(object):
+    """
+    The in-memory record of a player with a session on the server.
+
+    Attribute reads never touch the database. Writes go to the record and
+    the PlayerManager's journal, which writes them back in batches, and are
+    published to the PlayerManager's subscribers.
+
+    Once its session has ended the player is detached, and further writes
+    are ignored, so they can't overwrite a later session's changes.
+    """
+
+    def __init__(self, record, manager):
+        self.__dict__['record'] = record
+        self.__dict__['manager'] = manager
+        self.__dict__['detached'] = False
+
+    def detach(self):
+        self.__dict__['detached'] = True
+
+    def __getattr__(self, name):
+        return getattr(self.record, name)
+
+    def storage_for(self, plugin):
+        """
+        Returns the PluginStore a plugin keeps for this player.
+
+        :param plugin: The plugin's name.
+        """
+        return self.manager.plugin_storage(self.record.uuid, plugin)
+
+    @property
+    def storage(self):
+        """
+        Deprecated: use `storage_for(name)`.
+        """
+        return _deprecated_storage(self, 1)
+
+    def __setattr__(self, name, val):
+        if name == 'storage':
+            _set_deprecated_storage(self, val, 1)
+            return val
+        if self.detached:
+            logger.debug(
+                'Ignoring change to %s of player %s, whose session ended.',
+                name, self.record.uuid
+            )
+            return val
+        indexed = name in INDEXED_ATTRIBUTES
+        if indexed:
+            self.manager.unindex(self)
+        setattr(self.record, name, val)
+        if indexed:
+            self.manager.index(self)
+        self.manager.record_change(self.record, name)
+        self.manager.publish(self, name)
+
+        return val
+
+
 class Player(Base):
     __tablename__ = 'players'
 
     uuid = Column(String, primary_key=True)
     name = Column(String)
     org_name = Column(String)
+    # Case-folded copies of the names, for indexed lookups.
+    name_lower = Column(String, index=True)
+    org_name_lower = Column(String, index=True)
     last_seen = Column(DateTime)
     access_level = Column(Integer)
     logged_in = Column(Boolean)
@@ -217,13 +452,17 @@ class Player(Base):
     client_id = Column(Integer)
     party_id = Column(String)
     ip = Column(String)
-    plugin_storage = Column(JSONEncodedDict, default=dict())
     planet = Column(String)
     on_ship = Column(Boolean)
     muted = Column(Boolean)
 
     ips = relationship('IPAddress', order_by='IPAddress.id', backref='players')
 
+    @validates('name', 'org_name')
+    def fold_name(self, key, value):
+        setattr(self, SHADOW_COLUMNS[key], _fold(value))
+        return value
+
     def colored_name(self, colors):
         logger.vdebug('Building colored name.')
         color = colors[UserLevels(self.access_level).lower()]
@@ -238,27 +477,6 @@ class Player(Base):
         )
         return '{}{}{}'.format(color, name, colors['default'])
 
-    @property
-    def storage(self):
-        caller = inspect.stack()[2][0].f_locals['self'].__class__.name
-        if self.plugin_storage is None:
-            self.plugin_storage = {}
-        try:
-            return self.plugin_storage[caller]
-        except (ValueError, KeyError, TypeError):
-            self.plugin_storage[caller] = {}
-            return self.plugin_storage[caller]
-
-    @storage.setter
-    def storage(self, store):
-        caller = inspect.stack()[2][0].f_locals['self'].__class__.name
-        self.plugin_storage[caller] = store
-
-    def as_dict(self):
-        d = super(Player, self).as_dict()
-        d['plugin_storage'] = json.loads(d['plugin_storage'])
-        return d
-
 
 class IPAddress(Base):
     __tablename__ = 'ips'
@@ -268,6 +486,92 @@ class IPAddress(Base):
     player = relationship('Player', backref=backref('players', order_by=id))
 
 
+class PluginStorage(Base):
+    __tablename__ = 'plugin_storage'
+    uuid = Column(String, ForeignKey('players.uuid'), primary_key=True)
+    plugin = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    value = Column(JSONEncodedValue)
+
+
+class PluginStore(object):
+    """
+    The values one plugin keeps for one player, stored per key.
+
+    Behaves like a dict, but each key is only loaded from the database when
+    first used, and writes go to the PlayerManager's journal.
+    """
+    _missing = object()
+
+    def __init__(self, manager, uuid, plugin):
+        self.manager = manager
+        self.uuid = uuid
+        self.plugin = plugin
+        # Loaded values by key, _missing for keys not in the database.
+        self.values = {}
+
+    def _load(self, key):
+        if key not in self.values:
+            with _autoclosing_session(self.manager.sessionmaker) as session:
+                row = session.query(PluginStorage).filter_by(
+                    uuid=self.uuid, plugin=self.plugin, key=key
+                ).first()
+            self.values[key] = self._missing if row is None else row.value
+        return self.values[key]
+
+    def __contains__(self, key):
+        return self._load(key) is not self._missing
+
+    def __getitem__(self, key):
+        value = self._load(key)
+        if value is self._missing:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        value = self._load(key)
+        if value is self._missing:
+            return default
+        return value
+
+    def __setitem__(self, key, value):
+        self.values[key] = value
+        self.manager.record_storage_change(self, key)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.values[key] = self._missing
+        self.manager.record_storage_change(self, key)
+
+    def clear(self):
+        """
+        Deletes every key, loaded or not.
+        """
+        with _autoclosing_session(self.manager.sessionmaker) as session:
+            keys = [
+                row.key for row in session.query(PluginStorage.key).filter_by(
+                    uuid=self.uuid, plugin=self.plugin
+                )
+            ]
+        for key in set(keys) | set(self.values):
+            if key in self:
+                del self[key]
+
+    def pending(self, key):
+        """
+        The value to write for a changed key, DELETED if it was removed.
+        """
+        value = self.values[key]
+        if value is self._missing:
+            return DELETED
+        return copy.deepcopy(value)
+
+
+# Marks plugin storage keys to delete in a WriteBatch.
+DELETED = object()
+
+
 class Ban(Base):
     __tablename__ = 'bans'
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -275,21 +579,94 @@ class Ban(Base):
     reason = Column(String)
 
 
+# Columns with a case-folded copy, and the name of the copy.
+SHADOW_COLUMNS = {'name': 'name_lower', 'org_name': 'org_name_lower'}
+# Attributes of cached players the in-memory indexes are keyed by.
+INDEXED_ATTRIBUTES = frozenset(['name', 'org_name', 'protocol'])
+# Columns whose changes are written to the database right away.
+CRITICAL_COLUMNS = frozenset(['access_level'])
+
+
+class WriteBatch(object):
+    """
+    Journaled changes handed to the database writer thread.
+
+    `updates` and `storage_updates` hold the values to write, taken on the
+    reactor thread, and `journal` and `storage_journal` the journals they
+    came from, to restore them if the write fails.
+    """
+
+    def __init__(self, journal, storage_journal):
+        self.journal = journal
+        self.storage_journal = storage_journal
+        self.updates = {}
+        for uuid, columns in journal.iteritems():
+            self.updates[uuid] = dict(
+                (column, getattr(record, column))
+                for column, record in columns.iteritems()
+            )
+        self.storage_updates = dict(
+            (entry, store.pending(entry[2]))
+            for entry, store in storage_journal.iteritems()
+        )
+        self.written = False
+        self.waiters = []
+
+
 class PlayerManager(object):
-    def __init__(self, config):
+    """
+    Keeps the players with a session in memory, and the rest in the player
+    database.
+
+    The plain methods are synchronous: they answer from the cache when they
+    can and otherwise query the database on the calling thread. The
+    `*_async` methods return Deferreds instead, and run their database work
+    on a single writer thread and a pool of reader threads, which must be
+    started with `start` and stopped with `stop`.
+    """
+
+    def __init__(self, config, flush_threshold=100, read_threads=2):
         self.config = config
+        self.flush_threshold = flush_threshold
         migrate_db(self.config)
         logger.info('Loading player database.')
         try:
-            self.engine = create_engine(
-                'sqlite:///{}'.format(
-                    path.preauthChild(self.config.player_db).path
-                )
+            # The reactor thread, the writer and the readers.
+            self.engine = create_player_db_engine(
+                path.preauthChild(self.config.player_db).path,
+                self.config.player_db_profile,
+                read_threads + 2
             )
         except exc.SQLAlchemyError as e:
             logger.warning('SQL Errror: %s', e)
         Base.metadata.create_all(self.engine)
-        self.sessionmaker = sessionmaker(bind=self.engine, autoflush=True)
+        self.sessionmaker = sessionmaker(
+            bind=self.engine, autoflush=True, expire_on_commit=False
+        )
+        # CachedPlayers of everyone with a session, by uuid, with indexes
+        # by case-folded name and org_name, and by protocol id.
+        self.sessions = {}
+        self.names = {}
+        self.org_names = {}
+        self.protocols = {}
+        # Write-behind journal: the changed columns of each player, by uuid,
+        # and how many changes were made since the last flush.
+        self.journal = {}
+        self.pending_changes = 0
+        # Plugin storage changes, as the PluginStore holding them by (uuid,
+        # plugin, key), and the stores of players with a session, by uuid
+        # and plugin.
+        self.storage_journal = {}
+        self.stores = {}
+        # WriteBatches handed to the writer thread and not written yet. The
+        # lock is held while writing, so the synchronous flush can write
+        # them in order ahead of its own changes.
+        self.in_flight = []
+        self.write_lock = threading.Lock()
+        self.writer = ThreadPool(1, 1, 'player_db_writer')
+        self.readers = ThreadPool(1, read_threads, 'player_db_reader')
+        # Callbacks told about changes to players with a session.
+        self.subscribers = []
         with _autoclosing_session(self.sessionmaker) as session:
             query = session.query(Player).filter_by(logged_in=True).all()
             for player in query:
@@ -299,27 +676,286 @@ class PlayerManager(object):
                 player.protocol = None
                 session.commit()
 
-    def _cache_and_return_from_session(
-        self,
-        session,
-        record,
-        collection=False
-    ):
+    def _cache_and_return_from_session(self, session, record):
         to_return = record
 
-        if not isinstance(record, Base):
-            return to_return
+        # Listings are returned as plain detached rows: wrapping each one
+        # would cost a query for every attribute read.
+        if isinstance(record, Base):
+            to_return = self._wrap(record)
+
+        return to_return
 
-        if collection:
-            to_return = []
-            for r in record:
-                to_return.append(
-                    RecordWithAttachedSession(r, self.sessionmaker)
+    def _wrap(self, record):
+        if isinstance(record, Player) and record.uuid in self.sessions:
+            return self.sessions[record.uuid]
+        return RecordWithAttachedSession(record, self)
+
+    def index(self, player):
+        """
+        Adds a cached player to the in-memory indexes.
+        """
+        if self.sessions.get(player.uuid) is not player:
+            return
+        if player.name is not None:
+            self.names[_fold(player.name)] = player.uuid
+        if player.org_name is not None:
+            self.org_names[_fold(player.org_name)] = player.uuid
+        if player.protocol is not None:
+            self.protocols[player.protocol] = player
+
+    def unindex(self, player):
+        """
+        Removes a cached player from the in-memory indexes.
+        """
+        uuid = player.uuid
+        if self.names.get(_fold(player.name)) == uuid:
+            del self.names[_fold(player.name)]
+        if self.org_names.get(_fold(player.org_name)) == uuid:
+            del self.org_names[_fold(player.org_name)]
+        if self.protocols.get(player.protocol) is player:
+            del self.protocols[player.protocol]
+
+    def _find_session(self, index, name):
+        return self.sessions.get(index.get(_fold(name)))
+
+    def subscribe(self, callback):
+        """
+        Calls `callback(player, name)` whenever the attribute `name` of a
+        player with a session changes, so plugins can drop what they
+        worked out from it.
+        """
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def publish(self, player, name):
+        for callback in self.subscribers:
+            callback(player, name)
+
+    def record_change(self, record, name):
+        """
+        Journals a change made to a player record.
+
+        Repeated changes to the same column are coalesced, and only its
+        latest value is written. The journal is flushed once
+        `flush_threshold` changes pile up, or right away for critical
+        columns.
+        """
+        columns = self.journal.setdefault(record.uuid, {})
+        columns[name] = record
+        if name in SHADOW_COLUMNS:
+            columns[SHADOW_COLUMNS[name]] = record
+        self.pending_changes += 1
+        if (
+                name in CRITICAL_COLUMNS or
+                self.pending_changes >= self.flush_threshold
+        ):
+            self.flush()
+
+    def record_storage_change(self, store, key):
+        """
+        Journals a change made to a PluginStore.
+        """
+        self.storage_journal[(store.uuid, store.plugin, key)] = store
+        self.pending_changes += 1
+        if self.pending_changes >= self.flush_threshold:
+            self.flush()
+
+    def plugin_storage(self, uuid, plugin):
+        """
+        Returns the PluginStore a plugin keeps for a player.
+
+        :param uuid: The player's uuid.
+        :param plugin: The plugin's name.
+        """
+        stores = self.stores.get(uuid)
+        if stores is not None and plugin in stores:
+            return stores[plugin]
+        # A store from an earlier session may still have changes to write.
+        for pending_uuid, pending_plugin, _ in self.storage_journal:
+            if pending_uuid == uuid and pending_plugin == plugin:
+                self.flush()
+                break
+        store = PluginStore(self, uuid, plugin)
+        if uuid in self.sessions:
+            self.stores.setdefault(uuid, {})[plugin] = store
+        return store
+
+    def _take_journal(self):
+        batch = WriteBatch(self.journal, self.storage_journal)
+        self.journal = {}
+        self.storage_journal = {}
+        self.pending_changes = 0
+        return batch
+
+    def _restore_journal(self, batch):
+        for uuid, columns in batch.journal.iteritems():
+            columns.update(self.journal.get(uuid, {}))
+            self.journal[uuid] = columns
+        for entry, store in batch.storage_journal.iteritems():
+            self.storage_journal.setdefault(entry, store)
+
+    def _write(self, updates, storage_updates):
+        with _autoclosing_session(self.sessionmaker) as session:
+            for uuid, values in updates.iteritems():
+                session.query(Player).filter_by(uuid=uuid).update(
+                    values, synchronize_session=False
                 )
-        else:
-            to_return = RecordWithAttachedSession(record, self.sessionmaker)
+            rows = []
+            for (uuid, plugin, key), value in storage_updates.iteritems():
+                if value is DELETED:
+                    session.query(PluginStorage).filter_by(
+                        uuid=uuid, plugin=plugin, key=key
+                    ).delete(synchronize_session=False)
+                else:
+                    rows.append(
+                        dict(uuid=uuid, plugin=plugin, key=key, value=value)
+                    )
+            if rows:
+                session.execute(
+                    PluginStorage.__table__.insert().prefix_with(
+                        'OR REPLACE'
+                    ),
+                    rows
+                )
+            session.commit()
 
-        return to_return
+    def flush(self):
+        """
+        Writes every journaled change back to the database, in a single
+        transaction, along with any batch still waiting for the writer
+        thread.
+        """
+        batch = self._take_journal()
+        with self.write_lock:
+            batches = [
+                pending for pending in self.in_flight if not pending.written
+            ]
+            batches.append(batch)
+            updates = {}
+            storage_updates = {}
+            for pending in batches:
+                for uuid, values in pending.updates.iteritems():
+                    updates.setdefault(uuid, {}).update(values)
+                storage_updates.update(pending.storage_updates)
+            for pending in batches:
+                pending.written = True
+            if not updates and not storage_updates:
+                return
+            try:
+                self._write(updates, storage_updates)
+            except exc.SQLAlchemyError:
+                logger.exception(
+                    'Couldn\'t write player changes, will retry.'
+                )
+                for pending in batches:
+                    self._restore_journal(pending)
+
+    def _write_batch(self, batch):
+        # Runs on the writer thread.
+        with self.write_lock:
+            if batch.written:
+                return
+            batch.written = True
+            self._write(batch.updates, batch.storage_updates)
+
+    def flush_async(self):
+        """
+        Hands every journaled change to the writer thread.
+
+        :return: A Deferred which fires once they are written.
+        """
+        batch = self._take_journal()
+        if not batch.updates and not batch.storage_updates:
+            return succeed(None)
+        self.in_flight.append(batch)
+
+        def failed(failure):
+            logger.error(
+                'Couldn\'t write player changes, will retry: %s',
+                failure.getErrorMessage()
+            )
+            self._restore_journal(batch)
+
+        def done(_):
+            self.in_flight.remove(batch)
+            for waiter in batch.waiters:
+                waiter.callback(None)
+
+        d = deferToThreadPool(reactor, self.writer, self._write_batch, batch)
+        d.addErrback(failed)
+        d.addCallback(done)
+        return d
+
+    def _when_written(self):
+        waiters = []
+        for batch in self.in_flight:
+            waiter = Deferred()
+            batch.waiters.append(waiter)
+            waiters.append(waiter)
+        return DeferredList(waiters)
+
+    def _query_async(self, query):
+        """
+        Runs `query(session)` on a reader thread once all changes so far are
+        written.
+
+        :return: A Deferred firing with the result, wrapped as the
+                 synchronous lookups would.
+        """
+        def read(_):
+            return deferToThreadPool(reactor, self.readers, run)
+
+        def run():
+            with _autoclosing_session(self.sessionmaker) as session:
+                return query(session)
+
+        self.flush_async()
+        d = self._when_written()
+        d.addCallback(read)
+        d.addCallback(
+            lambda record: self._cache_and_return_from_session(None, record)
+        )
+        return d
+
+    def start(self):
+        """
+        Starts the database threads used by the asynchronous methods.
+        """
+        self.writer.start()
+        self.readers.start()
+
+    def stop(self):
+        """
+        Writes the journal and stops the database threads.
+        """
+        self.flush()
+        self.readers.stop()
+        self.writer.stop()
+        self.engine.dispose()
+
+    def flush_player(self, uuid):
+        """
+        Flushes the journal if it holds changes to the given player.
+        """
+        if uuid in self.journal:
+            self.flush()
+
+    def end_session(self, player):
+        """
+        Writes a player's pending changes and drops them from the cache.
+
+        The player is detached, so later writes to it are ignored.
+        """
+        self.unindex(player)
+        player.detach()
+        if self.sessions.get(player.uuid) is player:
+            del self.sessions[player.uuid]
+            self.stores.pop(player.uuid, None)
+        self.flush()
 
     def fetch_or_create(
         self,
@@ -330,6 +966,10 @@ class PlayerManager(object):
         ip,
         protocol=None
     ):
+        cached = self.sessions.get(uuid)
+        if cached is not None and cached.logged_in:
+            raise AlreadyLoggedIn
+        self.flush()
         with _autoclosing_session(self.sessionmaker) as session:
             query = session.query(Player).filter_by(uuid=uuid, logged_in=True)
             if query.first():
@@ -380,42 +1020,59 @@ class PlayerManager(object):
 
             session.commit()
 
-            return self._cache_and_return_from_session(session, player)
+        cached = self.sessions.get(uuid)
+        if cached is not None:
+            self.unindex(cached)
+        cached = CachedPlayer(player, self)
+        self.sessions[uuid] = cached
+        self.index(cached)
+        return cached
 
     def delete(self, player_cache):
+        cached = self.sessions.pop(player_cache.uuid, None)
+        if cached is not None:
+            self.unindex(cached)
+        self.journal.pop(player_cache.uuid, None)
+        self.stores.pop(player_cache.uuid, None)
+        for entry in self.storage_journal.keys():
+            if entry[0] == player_cache.uuid:
+                del self.storage_journal[entry]
         with _autoclosing_session(self.sessionmaker) as session:
+            session.query(PluginStorage).filter_by(
+                uuid=player_cache.uuid
+            ).delete(synchronize_session=False)
             session.delete(player_cache.record)
             session.commit()
 
     def who(self):
-        with _autoclosing_session(self.sessionmaker) as session:
-            return self._cache_and_return_from_session(
-                session,
-                session.query(Player).filter_by(logged_in=True).all(),
-                collection=True,
-            )
+        return [
+            player for player in self.sessions.itervalues()
+            if player.logged_in
+        ]
 
     def all(self):
+        self.flush()
         with _autoclosing_session(self.sessionmaker) as session:
             return self._cache_and_return_from_session(
                 session,
-                session.query(Player).all(),
-                collection=True,
+                session.query(Player).all()
             )
 
     def all_like(self, regex):
+        self.flush()
         with _autoclosing_session(self.sessionmaker) as session:
             return self._cache_and_return_from_session(
                 session,
-                session.query(Player).filter(Player.name.like(regex)).all(),
-                collection=True,
+                session.query(Player).filter(Player.name.like(regex)).all()
             )
 
     def whois(self, name):
+        cached = self._find_session(self.names, name)
+        if cached is not None:
+            return cached
+        self.flush()
         with _autoclosing_session(self.sessionmaker) as session:
-            query = session.query(Player).filter(
-                func.lower(Player.name) == func.lower(name)
-            )
+            query = session.query(Player).filter_by(name_lower=_fold(name))
             return (query).first()
 
     def list_bans(self):
@@ -427,6 +1084,7 @@ class PlayerManager(object):
             return session.query(Ban).filter_by(ip=ip).first() is not None
 
     def unban(self, ip):
+        self.flush()
         with _autoclosing_session(self.sessionmaker) as session:
             res = session.query(Ban).filter_by(ip=ip).first()
             if res is None:
@@ -435,6 +1093,7 @@ class PlayerManager(object):
             session.commit()
 
     def ban(self, ip):
+        self.flush()
         with _autoclosing_session(self.sessionmaker) as session:
             session.add(Ban(ip=ip))
             session.commit()
@@ -448,29 +1107,42 @@ class PlayerManager(object):
             )
 
     def delete_ban(self, ban_cache):
+        self.flush()
         with _autoclosing_session(self.sessionmaker) as session:
             session.delete(ban_cache.record)
             session.commit()
 
     def get_by_name(self, name):
+        cached = self._find_session(self.names, name)
+        if cached is not None:
+            return cached
+        self.flush()
         with _autoclosing_session(self.sessionmaker) as session:
             return self._cache_and_return_from_session(
                 session,
-                session.query(Player).filter(
-                    func.lower(Player.name) == func.lower(name)
+                session.query(Player).filter_by(
+                    name_lower=_fold(name)
                 ).first(),
             )
 
     def get_by_org_name(self, org_name):
+        cached = self._find_session(self.org_names, org_name)
+        if cached is not None:
+            return cached
+        self.flush()
         with _autoclosing_session(self.sessionmaker) as session:
             return self._cache_and_return_from_session(
                 session,
-                session.query(Player).filter(
-                    func.lower(Player.org_name) == func.lower(org_name)
+                session.query(Player).filter_by(
+                    org_name_lower=_fold(org_name)
                 ).first(),
             )
 
     def get_by_uuid(self, uuid):
+        cached = self.sessions.get(uuid)
+        if cached is not None:
+            return cached
+        self.flush()
         with _autoclosing_session(self.sessionmaker) as session:
             return self._cache_and_return_from_session(
                 session,
@@ -480,14 +1152,66 @@ class PlayerManager(object):
             )
 
     def get_logged_in_by_name(self, name):
-        with _autoclosing_session(self.sessionmaker) as session:
-            return self._cache_and_return_from_session(
-                session,
-                session.query(Player).filter(
-                    Player.logged_in,
-                    func.lower(Player.name) == func.lower(name),
-                ).first(),
-            )
+        player = self._find_session(self.names, name)
+        if player is not None and player.logged_in:
+            return player
+
+    def get_logged_in_by_org_name(self, org_name):
+        """
+        Returns the cached player logged in with an org_name, if any. Never
+        touches the database.
+        """
+        player = self._find_session(self.org_names, org_name)
+        if player is not None and player.logged_in:
+            return player
+
+    def get_by_protocol(self, protocol):
+        """
+        Returns the cached player connected through a protocol, if any.
+        """
+        return self.protocols.get(protocol)
+
+    def all_async(self):
+        return self._query_async(
+            lambda session: session.query(Player).all()
+        )
+
+    def all_like_async(self, regex):
+        return self._query_async(
+            lambda session: session.query(Player).filter(
+                Player.name.like(regex)
+            ).all()
+        )
+
+    def get_by_name_async(self, name):
+        cached = self._find_session(self.names, name)
+        if cached is not None:
+            return succeed(cached)
+        return self._query_async(
+            lambda session: session.query(Player).filter_by(
+                name_lower=_fold(name)
+            ).first()
+        )
+
+    def get_by_org_name_async(self, org_name):
+        cached = self._find_session(self.org_names, org_name)
+        if cached is not None:
+            return succeed(cached)
+        return self._query_async(
+            lambda session: session.query(Player).filter_by(
+                org_name_lower=_fold(org_name)
+            ).first()
+        )
+
+    def get_by_uuid_async(self, uuid):
+        cached = self.sessions.get(uuid)
+        if cached is not None:
+            return succeed(cached)
+        return self._query_async(
+            lambda session: session.query(Player).filter(
+                func.lower(Player.uuid) == func.lower(uuid)
+            ).first()
+        )
 
 
 def permissions(level=UserLevels.OWNER):
@@ -7,7 +7,6 @@ from twisted.words.ewords import AlreadyLoggedIn
 
 from base_plugin import SimpleCommandPlugin
 from manager import PlayerManager, Banned, permissions, UserLevels
-from packets import client_connect, connect_success
 import packets
 from utility_functions import extract_name, build_packet, Planet
 
@@ -21,24 +20,54 @@ class PlayerManagerPlugin(SimpleCommandPlugin):
 
     def activate(self):
         super(PlayerManagerPlugin, self).activate()
-        self.player_manager = PlayerManager(self.config)
-        self.l_call = LoopingCall(self.check_logged_in)
-        self.l_call.start(1, now=False)
-        self.regexes = self.config.plugin_config['name_removal_regexes']
-        self.adminss = self.config.plugin_config['admin_ss']
+        self.player_manager = PlayerManager(
+            self.config,
+            self.plugin_config['flush_threshold'],
+            self.plugin_config['read_threads']
+        )
+        self.player_manager.start()
+        self.presence_call = LoopingCall(self.check_presence)
+        self.presence_call.start(
+            self.plugin_config['presence_check_interval'], now=False
+        )
+        self.flush_call = LoopingCall(self.player_manager.flush_async)
+        self.flush_call.start(
+            self.plugin_config['flush_interval'], now=False
+        )
+        self.regexes = self.plugin_config['name_removal_regexes']
+        self.adminss = self.plugin_config['admin_ss']
 
     def deactivate(self):
+        for call in (self.presence_call, self.flush_call):
+            if call.running:
+                call.stop()
+        self.player_manager.stop()
         del self.player_manager
 
-    def check_logged_in(self):
-        for player in self.player_manager.who():
-            if player.protocol not in self.factory.protocols.keys():
-                player.logged_in = False
-                player.admin_logged_in = False
-                player.party_id = ''
+    def check_presence(self):
+        """
+        Ends the sessions of players whose connection is gone.
+
+        Sessions are ended as connections close, so this only catches the
+        ones a disconnect slipped past.
+        """
+        protocols = self.factory.protocols
+        for player in self.player_manager.sessions.values():
+            if player.protocol not in protocols:
+                self.logger.warning(
+                    'Player %s lost their connection without logging out.',
+                    player.name
+                )
+                self.end_session(player)
+
+    def end_session(self, player):
+        player.logged_in = False
+        player.admin_logged_in = False
+        player.party_id = ''
+        self.player_manager.end_session(player)
 
     def on_client_connect(self, data):
-        client_data = client_connect().parse(data.data)
+        client_data = data.parsed
         try:
             changed_name = client_data.name
 
@@ -87,11 +116,9 @@ class PlayerManagerPlugin(SimpleCommandPlugin):
             else:
                 admin_login = False
 
-            original_name = client_data.name
-            client_data.name = changed_name
             self.protocol.player = self.player_manager.fetch_or_create(
-                name=client_data.name,
-                org_name=original_name,
+                name=changed_name,
+                org_name=client_data.name,
                 admin_logged_in=admin_login,
                 uuid=str(client_data.uuid),
                 ip=self.protocol.transport.getPeer().host,
@@ -159,15 +186,19 @@ class PlayerManagerPlugin(SimpleCommandPlugin):
                 )
             ) + unlocked_sector_magic
         )
-        self.protocol.transport.write(rejection)
+        self.protocol.write(rejection)
+        self.protocol.close_output()
         self.protocol.transport.loseConnection()
 
     def on_connect_failure(self, data):
+        if self.protocol.player is not None:
+            self.end_session(self.protocol.player)
+        self.protocol.close_output()
         self.protocol.transport.loseConnection()
 
     def on_connect_success(self, data):
         try:
-            connection_parameters = connect_success().parse(data.data)
+            connection_parameters = data.parsed
 
             self.protocol.player.client_id = connection_parameters.client_id
             self.protocol.player.logged_in = True
@@ -187,7 +218,7 @@ class PlayerManagerPlugin(SimpleCommandPlugin):
             return True
 
     def after_world_start(self, data):
-        world_start = packets.world_start().parse(data.data)
+        world_start = data.parsed
         if 'ship.maxFuel' in world_start['world_properties']:
             self.logger.info(
                 'Player %s is now on a ship.', self.protocol.player.name
@@ -207,12 +238,12 @@ class PlayerManagerPlugin(SimpleCommandPlugin):
             self.protocol.player.planet = str(planet)
 
     def on_client_disconnect_request(self, player):
-        if self.protocol.player is not None and self.protocol.player.logged_in:
-            self.logger.info(
-                'Player disconnected: %s', self.protocol.player.name
-            )
-            self.protocol.player.logged_in = False
-            self.protocol.player.admin_logged_in = False
+        if self.protocol.player is not None:
+            if self.protocol.player.logged_in:
+                self.logger.info(
+                    'Player disconnected: %s', self.protocol.player.name
+                )
+            self.end_session(self.protocol.player)
         return True
 
     @permissions(UserLevels.REGISTERED)
@@ -0,0 +1,392 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import TestCase
+
+from mock import Mock, patch
+from sqlalchemy.pool import NullPool, SingletonThreadPool
+from twisted.internet.defer import Deferred
+from twisted.python.filepath import FilePath
+from twisted.words.ewords import AlreadyLoggedIn
+
+from plugins.core.player_manager_plugin.manager import (
+    CachedPlayer,
+    Player,
+    PlayerManager,
+    RecordWithAttachedSession,
+    create_player_db_engine
+)
+
+
+class ManagerTestCase(TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        patcher = patch(
+            'plugins.core.player_manager_plugin.manager.path',
+            FilePath(self.tempdir)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.config = Mock(
+            player_db='player.db', owner_uuid='owner', player_db_profile={}
+        )
+        self.manager = PlayerManager(self.config)
+
+    def log_in(self, uuid='abc', name='Name'):
+        player = self.manager.fetch_or_create(
+            uuid=uuid,
+            name=name,
+            org_name=name,
+            admin_logged_in=False,
+            ip='127.0.0.1',
+            protocol='protocol'
+        )
+        player.logged_in = True
+        return player
+
+    def reopen(self):
+        return PlayerManager(self.config)
+
+
+class PlayerManagerTestCase(ManagerTestCase):
+    def test_session_is_cached(self):
+        player = self.log_in()
+
+        self.assertIsInstance(player, CachedPlayer)
+        self.assertIs(self.manager.get_by_uuid('abc'), player)
+        self.assertIs(self.manager.get_by_name('name'), player)
+        self.assertIs(self.manager.get_logged_in_by_name('NAME'), player)
+        self.assertIs(self.manager.get_logged_in_by_org_name('name'), player)
+        self.assertEqual(self.manager.who(), [player])
+        with self.assertRaises(AlreadyLoggedIn):
+            self.log_in()
+
+    def test_reads_do_not_touch_the_database(self):
+        player = self.log_in()
+        self.manager.flush()
+
+        with patch.object(self.manager, 'sessionmaker') as mock_sm:
+            player.on_ship
+            player.planet
+            player.access_level
+            self.assertFalse(mock_sm.called)
+
+    def test_writes_are_batched(self):
+        player = self.log_in()
+        player.planet = 'somewhere'
+        player.on_ship = False
+        player.planet = 'somewhere else'
+        self.assertEqual(
+            sorted(self.manager.journal['abc']),
+            ['logged_in', 'on_ship', 'planet']
+        )
+        self.assertEqual(self.reopen().get_by_uuid('abc').planet, '')
+
+        self.manager.flush()
+        self.assertEqual(self.manager.journal, {})
+        self.assertEqual(self.manager.pending_changes, 0)
+        stored = self.reopen().get_by_uuid('abc')
+        self.assertEqual(stored.planet, 'somewhere else')
+        self.assertFalse(stored.on_ship)
+
+    def test_flush_after_threshold(self):
+        self.manager.flush_threshold = 3
+        player = self.log_in()
+        self.manager.flush()
+        player.planet = 'a'
+        player.planet = 'b'
+        self.assertIn('abc', self.manager.journal)
+
+        player.on_ship = False
+        self.assertEqual(self.manager.journal, {})
+        self.assertEqual(self.reopen().get_by_uuid('abc').planet, 'b')
+
+    def test_critical_columns_are_written_through(self):
+        player = self.log_in()
+        player.access_level = 100
+
+        self.assertEqual(self.manager.journal, {})
+        self.assertEqual(self.reopen().get_by_uuid('abc').access_level, 100)
+
+    def test_offline_writes_are_journaled(self):
+        self.manager.end_session(self.log_in())
+        stored = self.manager.get_by_uuid('abc')
+        stored.muted = True
+
+        self.assertIn('abc', self.manager.journal)
+        self.assertTrue(stored.muted)
+        self.assertEqual(self.manager.journal, {})
+
+    def test_end_session(self):
+        player = self.log_in()
+        player.logged_in = False
+        player.name = 'Renamed'
+        self.manager.end_session(player)
+
+        self.assertEqual(self.manager.who(), [])
+        stored = self.manager.get_by_uuid('abc')
+        self.assertIsInstance(stored, RecordWithAttachedSession)
+        self.assertEqual(stored.name, 'Renamed')
+
+    def test_listings_are_detached_rows(self):
+        player = self.log_in()
+        player.planet = 'somewhere'
+        self.manager.end_session(self.log_in(uuid='def', name='Other'))
+
+        players = self.manager.all()
+        self.assertTrue(all(isinstance(p, Player) for p in players))
+        with patch.object(self.manager, 'sessionmaker') as mock_sm:
+            self.assertEqual(
+                sorted((p.name, p.planet) for p in players),
+                [('Name', 'somewhere'), ('Other', '')]
+            )
+            self.assertFalse(mock_sm.called)
+
+    def test_ended_session_ignores_writes(self):
+        old = self.log_in()
+        old.logged_in = False
+        self.manager.end_session(old)
+        new = self.log_in()
+
+        old.logged_in = False
+        old.planet = 'stale'
+        self.manager.flush()
+        self.assertTrue(new.logged_in)
+        # Read directly, as a new PlayerManager logs everyone out.
+        db = sqlite3.connect(os.path.join(self.tempdir, 'player.db'))
+        self.addCleanup(db.close)
+        self.assertEqual(
+            db.execute(
+                'SELECT `logged_in`, `planet` FROM `players`;'
+            ).fetchall(),
+            [(1, '')]
+        )
+
+    def test_indexes_follow_nick_and_logout(self):
+        player = self.log_in(name='Name')
+        self.assertIs(self.manager.get_by_protocol('protocol'), player)
+        self.assertIs(self.manager.get_by_org_name('NAME'), player)
+
+        player.name = 'Nick'
+        self.assertIsNone(self.manager.get_logged_in_by_name('name'))
+        self.assertIs(self.manager.get_logged_in_by_name('nICK'), player)
+        self.assertIs(self.manager.get_by_org_name('name'), player)
+
+        player.logged_in = False
+        self.manager.end_session(player)
+        self.assertEqual(self.manager.names, {})
+        self.assertEqual(self.manager.org_names, {})
+        self.assertEqual(self.manager.protocols, {})
+        self.assertEqual(self.manager.get_by_name('NICK').uuid, 'abc')
+        self.assertEqual(self.manager.get_by_org_name('NaMe').uuid, 'abc')
+
+    def test_changes_are_published(self):
+        player = self.log_in()
+        changed = Mock()
+        self.manager.subscribe(changed)
+        player.access_level = 100
+        changed.assert_called_once_with(player, 'access_level')
+
+        self.manager.unsubscribe(changed)
+        player.planet = 'somewhere'
+        self.assertEqual(changed.call_count, 1)
+
+    def test_shadow_columns_are_migrated(self):
+        self.manager.end_session(self.log_in(name='Name'))
+        db = sqlite3.connect(os.path.join(self.tempdir, 'player.db'))
+        db.execute('DROP INDEX `ix_players_name_lower`;')
+        db.execute('DROP INDEX `ix_players_org_name_lower`;')
+        db.execute(
+            'CREATE TABLE `old_players` AS SELECT `uuid`, `name`, '
+            '`org_name`, `access_level`, `logged_in`, `admin_logged_in`, '
+            '`protocol`, `client_id`, `party_id`, `ip`, `planet`, '
+            '`on_ship`, `muted`, `last_seen` FROM `players`;'
+        )
+        db.execute('DROP TABLE `players`;')
+        db.execute('ALTER TABLE `old_players` RENAME TO `players`;')
+        db.commit()
+        db.close()
+
+        manager = self.reopen()
+        self.assertEqual(manager.get_by_name('NAME').uuid, 'abc')
+        self.assertEqual(manager.get_by_org_name('name').uuid, 'abc')
+
+    def test_plugin_storage(self):
+        player = self.log_in()
+        store = player.storage_for('claims')
+        self.assertIs(player.storage_for('claims'), store)
+        self.assertNotIn('claims', store)
+        store['claims'] = 2
+        self.assertEqual(store['claims'], 2)
+        self.assertEqual(player.storage_for('other').get('claims'), None)
+        self.manager.end_session(player)
+
+        stored = self.manager.get_by_uuid('abc')
+        with patch.object(self.manager, 'sessionmaker') as mock_sm:
+            store = stored.storage_for('claims')
+            self.assertFalse(mock_sm.called)
+        self.assertEqual(store['claims'], 2)
+        del store['claims']
+        self.assertEqual(list(self.manager.storage_journal), [
+            ('abc', 'claims', 'claims')
+        ])
+        self.manager.flush()
+        self.assertNotIn(
+            'claims', self.reopen().plugin_storage('abc', 'claims')
+        )
+
+    def test_deprecated_storage(self):
+        player = self.log_in()
+
+        class OldPlugin(object):
+            name = 'old_plugin'
+
+            def load(self):
+                return player.storage
+
+            def save(self, storage):
+                player.storage = storage
+
+        plugin = OldPlugin()
+        storage = plugin.load()
+        self.assertIs(storage, player.storage_for('old_plugin'))
+        storage['claims'] = 1
+        plugin.save(storage)
+        self.manager.flush()
+        plugin.save({'last_given_fuel': '12.5'})
+        self.assertNotIn('claims', storage)
+        self.assertEqual(storage['last_given_fuel'], '12.5')
+
+        plugin.save({})
+        self.manager.flush()
+        store = self.reopen().plugin_storage('abc', 'old_plugin')
+        self.assertNotIn('claims', store)
+        self.assertNotIn('last_given_fuel', store)
+
+    def test_plugin_storage_is_migrated(self):
+        self.manager.end_session(self.log_in())
+        db = sqlite3.connect(os.path.join(self.tempdir, 'player.db'))
+        db.execute('DROP TABLE `plugin_storage`;')
+        db.execute('ALTER TABLE `players` ADD COLUMN `plugin_storage`;')
+        db.execute(
+            'UPDATE `players` SET `plugin_storage`=?;',
+            ('{"fuelgiver_plugin": {"last_given_fuel": "12.5"}}',)
+        )
+        db.commit()
+        db.close()
+
+        store = self.reopen().plugin_storage('abc', 'fuelgiver_plugin')
+        self.assertEqual(store['last_given_fuel'], '12.5')
+
+
+class AsyncPlayerManagerTestCase(ManagerTestCase):
+    def setUp(self):
+        super(AsyncPlayerManagerTestCase, self).setUp()
+        # Work handed to the database threads, run by hand.
+        self.queued = []
+        patcher = patch(
+            'plugins.core.player_manager_plugin.manager.deferToThreadPool',
+            self.defer_to_thread_pool
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def defer_to_thread_pool(self, reactor, pool, f, *args):
+        d = Deferred()
+        self.queued.append((pool, d, f, args))
+        return d
+
+    def run_queued(self):
+        while self.queued:
+            pool, d, f, args = self.queued.pop(0)
+            d.callback(f(*args))
+
+    def result_of(self, d):
+        results = []
+        d.addCallback(results.append)
+        self.run_queued()
+        self.assertEqual(len(results), 1)
+        return results[0]
+
+    def test_flush_async(self):
+        player = self.log_in()
+        player.planet = 'somewhere'
+        d = self.manager.flush_async()
+
+        self.assertEqual(self.manager.journal, {})
+        self.assertIs(self.queued[0][0], self.manager.writer)
+        self.assertEqual(self.reopen().get_by_uuid('abc').planet, '')
+        self.result_of(d)
+        self.assertEqual(self.manager.in_flight, [])
+        self.assertEqual(self.reopen().get_by_uuid('abc').planet, 'somewhere')
+
+    def test_sync_flush_writes_in_flight_batches_in_order(self):
+        player = self.log_in()
+        player.planet = 'first'
+        player.on_ship = False
+        d = self.manager.flush_async()
+        player.planet = 'second'
+        self.manager.flush()
+
+        stored = self.reopen().get_by_uuid('abc')
+        self.assertEqual(stored.planet, 'second')
+        self.assertFalse(stored.on_ship)
+
+        # The writer thread gets to the batch late, and leaves it be.
+        player.planet = 'third'
+        self.manager.flush()
+        self.result_of(d)
+        self.assertEqual(self.reopen().get_by_uuid('abc').planet, 'third')
+
+    def test_lookups_async(self):
+        player = self.log_in()
+        self.assertIs(self.result_of(self.manager.get_by_name_async('NAME')),
+                      player)
+        self.assertEqual(self.queued, [])
+
+        player.logged_in = False
+        player.name = 'Renamed'
+        self.manager.end_session(player)
+        d = self.manager.get_by_uuid_async('abc')
+        self.assertIs(self.queued[0][0], self.manager.readers)
+        stored = self.result_of(d)
+        self.assertIsInstance(stored, RecordWithAttachedSession)
+        self.assertEqual(stored.name, 'Renamed')
+
+        players = self.result_of(self.manager.all_like_async('ren%'))
+        self.assertEqual([p.uuid for p in players], ['abc'])
+
+
+class StorageProfileTestCase(TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.db_path = os.path.join(self.tempdir, 'player.db')
+
+    def pragma(self, engine, name):
+        with engine.connect() as connection:
+            return connection.exec_driver_sql(
+                'PRAGMA {};'.format(name)
+            ).scalar()
+
+    def test_default_profile(self):
+        engine = create_player_db_engine(self.db_path, {}, 4)
+
+        self.assertIsInstance(engine.pool, SingletonThreadPool)
+        self.assertEqual(self.pragma(engine, 'journal_mode'), 'wal')
+        # NORMAL
+        self.assertEqual(self.pragma(engine, 'synchronous'), 1)
+        self.assertEqual(self.pragma(engine, 'cache_size'), -16384)
+
+    def test_overrides(self):
+        engine = create_player_db_engine(
+            self.db_path,
+            {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'pool': 'null'},
+            4
+        )
+
+        self.assertIsInstance(engine.pool, NullPool)
+        self.assertEqual(self.pragma(engine, 'journal_mode'), 'delete')
+        self.assertEqual(self.pragma(engine, 'synchronous'), 2)
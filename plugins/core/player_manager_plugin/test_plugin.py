@@ -0,0 +1,51 @@
+from unittest import TestCase
+
+from mock import Mock
+
+from plugins.core.player_manager_plugin.plugin import PlayerManagerPlugin
+
+
+class PresenceTestCase(TestCase):
+    def setUp(self):
+        self.plugin = PlayerManagerPlugin()
+        self.plugin.factory = Mock(protocols={'connected': Mock()})
+        self.plugin.player_manager = Mock()
+        self.plugin.protocol = Mock()
+        self.plugin.logger = Mock()
+
+    def test_disconnect_ends_session(self):
+        player = self.plugin.protocol.player
+        player.logged_in = True
+
+        self.plugin.on_client_disconnect_request(None)
+        self.assertFalse(player.logged_in)
+        self.assertFalse(player.admin_logged_in)
+        self.plugin.player_manager.end_session.assert_called_once_with(player)
+
+    def test_connect_failure_ends_session(self):
+        player = self.plugin.protocol.player
+        player.logged_in = False
+
+        self.plugin.on_connect_failure(None)
+        self.plugin.player_manager.end_session.assert_called_once_with(player)
+        self.assertTrue(self.plugin.protocol.close_output.called)
+        self.assertTrue(self.plugin.protocol.transport.loseConnection.called)
+
+    def test_rejection_is_flushed_before_closing(self):
+        protocol = self.plugin.protocol
+        self.plugin.reject_with_reason('Go away')
+
+        self.assertEqual(
+            [name for name, _, _ in protocol.method_calls],
+            ['write', 'close_output', 'transport.loseConnection']
+        )
+
+    def test_check_presence(self):
+        connected = Mock(protocol='connected', logged_in=True)
+        gone = Mock(protocol='gone', logged_in=True)
+        self.plugin.player_manager.sessions = {'a': connected, 'b': gone}
+
+        self.plugin.check_presence()
+        self.plugin.player_manager.end_session.assert_called_once_with(gone)
+        self.assertFalse(gone.logged_in)
+        self.assertTrue(connected.logged_in)
@@ -27,7 +27,7 @@ class FuelGiver(SimpleCommandPlugin):
         Syntax: /fuel
         """
         try:
-            my_storage = self.protocol.player.storage
+            my_storage = self.protocol.player.storage_for(self.name)
         except AttributeError:
             self.logger.warning('Tried to give item to non-existent protocol.')
             return
@@ -35,7 +35,6 @@ class FuelGiver(SimpleCommandPlugin):
         if float(my_storage.get('last_given_fuel', 0.)) <= time() - 86400:
             my_storage['last_given_fuel'] = str(time())
             give_item_to_player(self.protocol, 'fillerup', 1)
-            self.protocol.player.storage = my_storage
             self.protocol.send_chat_message(
                 'You were given a daily fuel supply! Now go explore ;)'
             )
@@ -13,19 +13,18 @@ class NewPlayerGreeter(BasePlugin):
 
     def after_world_start(self, data):
         if self.protocol.player is not None and self.protocol.player.logged_in:
-            my_storage = self.protocol.player.storage
+            my_storage = self.protocol.player.storage_for(self.name)
             if not my_storage.get('given_starter_items', False):
                 self.give_items()
                 self.send_greetings()
                 my_storage['given_starter_items'] = True
-                self.protocol.player.storage = my_storage
                 self.logger.info(
                     'Gave starter items to %s.', self.protocol.player.name
                 )
 
     def give_items(self):
-        for item in self.config.plugin_config['items']:
+        for item in self.plugin_config['items']:
             give_item_to_player(self.protocol, item[0], item[1])
 
     def send_greetings(self):
-        self.protocol.send_chat_message(self.config.plugin_config['message'])
+        self.protocol.send_chat_message(self.plugin_config['message'])
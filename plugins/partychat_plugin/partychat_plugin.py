@@ -1,7 +1,6 @@
 # -*- coding: UTF-8 -*-
 from base_plugin import SimpleCommandPlugin
 from plugins.core.player_manager_plugin import permissions, UserLevels
-from packets import client_context_update
 from datetime import datetime
 
 
@@ -85,7 +84,7 @@ class PartyChatPlugin(SimpleCommandPlugin):
             )
 
     def on_client_context_update(self, data):
-        ccu_data = client_context_update().parse(data.data)
+        ccu_data = data.parsed
         for p in ccu_data['subpacket']:
             try:
                 if 'team.createTeam' in p['handler']:
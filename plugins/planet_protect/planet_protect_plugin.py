@@ -1,15 +1,14 @@
 from base_plugin import SimpleCommandPlugin
 from plugins.core.player_manager_plugin import UserLevels, permissions
-from packets import (
-    entity_create,
-    EntityType,
-    star_string,
-    entity_interact_result,
-    InteractionType
-)
+from packets import EntityType, Packets, star_string, InteractionType
+from protection_index import ProtectionIndex
 from utility_functions import extract_name
 
 
+# Player attributes a verdict depends on.
+JUDGED_ATTRIBUTES = frozenset(['access_level', 'on_ship', 'planet', 'org_name'])
+
+
 class PlanetProtectPlugin(SimpleCommandPlugin):
     """
     Allows planets to be either protector or unprotected. On protected planets,
@@ -22,44 +21,93 @@ class PlanetProtectPlugin(SimpleCommandPlugin):
 
     def activate(self):
         super(PlanetProtectPlugin, self).activate()
-        bad_packets = self.config.plugin_config.get('bad_packets', [])
-        for n in ['on_' + n.lower() for n in bad_packets]:
-            setattr(self, n, (lambda x: self.planet_check()))
+        # Hooks have to be in overridden_packets before the plugin manager
+        # maps them, which happens right after activation.
+        for name in self.plugin_config.get('bad_packets', []):
+            packet = getattr(Packets, name, None)
+            if packet is None:
+                self.logger.warning('Unknown bad packet %s.', name)
+                continue
+            self.overridden_packets.setdefault(
+                packet.value, {}
+            )['on'] = self.on_bad_packet
 
-        self.protected_planets = self.config.plugin_config.get(
-            'protected_planets', []
-        )
-        self.player_planets = self.config.plugin_config.get(
-            'player_planets', {}
+        self.protection = ProtectionIndex(
+            self.plugin_config.get('protected_planets', []),
+            self.plugin_config.get('player_planets', {})
         )
-        self.blacklist = self.config.plugin_config.get('blacklist', [])
+        # (may build, restricted) for each protocol id. Worked out on world
+        # start, and dropped when the protections or the player change.
+        self.verdicts = {}
+        self.blacklist = self.plugin_config.get('blacklist', [])
         self.player_manager = self.plugins[
             'player_manager_plugin'
         ].player_manager
-        self.protect_everything = self.config.plugin_config.get(
+        self.protect_everything = self.plugin_config.get(
             'protect_everything', []
         )
         self.block_all = False
+        self.protection.subscribe(self.protection_changed)
+        self.player_manager.subscribe(self.player_changed)
 
-    def planet_check(self):
-        if self.protocol.player.on_ship:
-            return True
-        elif (
-                self.protocol.player.planet in self.protected_planets and
-                self.protocol.player.access_level < UserLevels.ADMIN
-        ):
-            name = self.protocol.player.org_name
-            if name in self.player_planets[self.protocol.player.planet]:
-                return True
-            else:
-                return False
-        elif (
-                self.protect_everything and
-                self.protocol.player.access_level < UserLevels.REGISTERED
-        ):
-            return False
+    def deactivate(self):
+        super(PlanetProtectPlugin, self).deactivate()
+        self.protection.unsubscribe(self.protection_changed)
+        self.player_manager.unsubscribe(self.player_changed)
+
+    def judge(self, player):
+        """
+        Works out the (may build, restricted) verdict of a player.
+
+        `restricted` is whether the player is on a protected planet they
+        aren't registered to and don't administer.
+        """
+        planet = player.planet
+        restricted = (
+            planet in self.protection and
+            player.access_level < UserLevels.ADMIN and
+            not self.protection.is_allowed(planet, player.org_name)
+        )
+        if player.on_ship:
+            may_build = True
+        elif planet in self.protection:
+            may_build = not restricted
         else:
-            return True
+            may_build = not (
+                self.protect_everything and
+                player.access_level < UserLevels.REGISTERED
+            )
+        return may_build, restricted
+
+    def verdict(self):
+        """
+        Returns the cached verdict of the current player.
+        """
+        verdict = self.verdicts.get(self.protocol.id)
+        if verdict is None:
+            verdict = self.judge(self.protocol.player)
+            self.verdicts[self.protocol.id] = verdict
+        return verdict
+
+    def protection_changed(self, planet):
+        self.verdicts.clear()
+
+    def player_changed(self, player, name):
+        if name in JUDGED_ATTRIBUTES:
+            self.verdicts.pop(player.protocol, None)
+
+    def planet_check(self):
+        return self.verdict()[0]
+
+    def on_bad_packet(self, data):
+        return self.planet_check()
+
+    def after_world_start(self, data):
+        self.verdicts[self.protocol.id] = self.judge(self.protocol.player)
+
+    def on_client_disconnect_request(self, data):
+        self.verdicts.pop(self.protocol.id, None)
+        return True
 
     @permissions(UserLevels.MODERATOR)
     def protect(self, data):
@@ -92,15 +140,12 @@ class PlanetProtectPlugin(SimpleCommandPlugin):
 
         first_name = str(addplayer)
 
-        try:
-            if first_name in self.player_planets[self.protocol.player.planet]:
-                self.protocol.send_chat_message(
-                    'Player ^yellow;{}^green; is already in planet protect'
-                    ' list.'.format(first_name_color)
-                )
-                return
-        except:
-            pass
+        if self.protection.is_allowed(self.protocol.player.planet, first_name):
+            self.protocol.send_chat_message(
+                'Player ^yellow;{}^green; is already in planet protect'
+                ' list.'.format(first_name_color)
+            )
+            return
 
         # reset planet back to current planet
         planet = self.protocol.player.planet
@@ -109,17 +154,12 @@ class PlanetProtectPlugin(SimpleCommandPlugin):
                 'Can\'t protect ships (at the moment)'
             )
             return
-        if planet not in self.protected_planets:
-            self.protected_planets.append(planet)
+        if planet not in self.protection:
+            self.protection.protect(planet)
             self.protocol.send_chat_message('Planet successfully protected.')
             self.logger.info('Protected planet %s', planet)
             if first_name:
-                if planet not in self.player_planets:
-                    self.player_planets[planet] = [first_name]
-                else:
-                    self.player_planets[planet] = (
-                        self.player_planets[planet] + [first_name]
-                    )
+                self.protection.allow(planet, first_name)
                 self.protocol.send_chat_message(
                     'Adding ^yellow;%s^green; to planet list'.format(
                         first_name_color
@@ -129,12 +169,7 @@ class PlanetProtectPlugin(SimpleCommandPlugin):
             if first_name:
                 self.protocol.send_chat_message('Planet is already protected!')
             else:
-                if planet not in self.player_planets:
-                    self.player_planets[planet] = [first_name]
-                else:
-                    self.player_planets[planet] = (
-                        self.player_planets[planet] + [first_name]
-                    )
+                self.protection.allow(planet, first_name)
                 self.protocol.send_chat_message(
                     'Adding ^yellow;%s^green; to planet list'.format(
                         first_name_color
@@ -156,6 +191,7 @@ class PlanetProtectPlugin(SimpleCommandPlugin):
         else:
             self.protect_everything = True
             self.factory.broadcast('Planetary protection is now ^red;ENABLED')
+        self.verdicts.clear()
         self.save()
 
     @permissions(UserLevels.MODERATOR)
@@ -171,10 +207,10 @@ class PlanetProtectPlugin(SimpleCommandPlugin):
                 'Can\'t protect ships (at the moment)'
             )
             return
-        if planet in self.player_planets:
+        if self.protection.players(planet):
             self.protocol.send_chat_message(
                 'Players registered to this planet: ^green;{}'.format(
-                    '^yellow;, ^green;'.join(self.player_planets[planet])
+                    '^yellow;, ^green;'.join(self.protection.players(planet))
                     .replace('[', '')
                     .replace(']', '')
                 )
@@ -208,9 +244,8 @@ class PlanetProtectPlugin(SimpleCommandPlugin):
             return
 
         if not data:
-            if planet in self.protected_planets:
-                del self.player_planets[planet]
-                self.protected_planets.remove(planet)
+            if planet in self.protection:
+                self.protection.unprotect(planet)
                 self.protocol.send_chat_message(
                     'Planet successfully unprotected.'
                 )
@@ -218,8 +253,8 @@ class PlanetProtectPlugin(SimpleCommandPlugin):
             else:
                 self.protocol.send_chat_message('Planet is not protected!')
         else:
-            if first_name in self.player_planets[planet]:
-                self.player_planets[planet].remove(first_name)
+            if self.protection.is_allowed(planet, first_name):
+                self.protection.disallow(planet, first_name)
                 self.protocol.send_chat_message(
                     'Removed ^yellow;{}^green; from planet list'.format(
                         first_name_color
@@ -233,10 +268,10 @@ class PlanetProtectPlugin(SimpleCommandPlugin):
         self.save()
 
     def save(self):
-        self.config.plugin_config.update(
+        self.plugin_config.update(
             {
-                'protected_planets': self.protected_planets,
-                'player_planets': self.player_planets,
+                'protected_planets': self.protection.protected_planets,
+                'player_planets': self.protection.player_planets,
                 'blacklist': self.blacklist,
                 'protect_everything': self.protect_everything
             }
@@ -247,59 +282,45 @@ class PlanetProtectPlugin(SimpleCommandPlugin):
         """
         Projectile protection check
         """
-        if (
-                self.protocol.player.planet in self.protected_planets and
-                self.protocol.player.access_level < UserLevels.ADMIN
-        ):
-            name = self.protocol.player.org_name
-            if name in self.player_planets[self.protocol.player.planet]:
-                return True
-            else:
-                entities = entity_create().parse(data.data)
-                for entity in entities.entity:
-                    self.logger.vdebug('Entity Type: %s', entity.entity_type)
-                    if entity.entity_type == EntityType.PROJECTILE:
-                        self.logger.vdebug('projectile detected')
-                        if self.block_all:
-                            return False
-                        p_type = star_string('').parse(entity.payload)
-                        self.logger.vdebug('projectile: %s', p_type)
-                        if p_type in self.blacklist:
-                            if p_type in ['water', 'glowingrain']:
-                                self.logger.vdebug(
-                                    'Player %s attempted to use a prohibited '
-                                    'projectile, %s, on a protected planet.',
-                                    self.protocol.player.org_name, p_type
-                                )
-                            else:
-                                self.logger.info(
-                                    'Player %s attempted to use a prohibited '
-                                    'projectile, %s, on a protected planet.',
-                                    self.protocol.player.org_name, p_type
-                                )
-                            return False
+        if self.verdict()[1]:
+            entities = data.parsed
+            for entity in entities.entity:
+                self.logger.vdebug('Entity Type: %s', entity.entity_type)
+                if entity.entity_type == EntityType.PROJECTILE:
+                    self.logger.vdebug('projectile detected')
+                    if self.block_all:
+                        return False
+                    p_type = star_string('').parse(entity.payload)
+                    self.logger.vdebug('projectile: %s', p_type)
+                    if p_type in self.blacklist:
+                        if p_type in ['water', 'glowingrain']:
+                            self.logger.vdebug(
+                                'Player %s attempted to use a prohibited '
+                                'projectile, %s, on a protected planet.',
+                                self.protocol.player.org_name, p_type
+                            )
+                        else:
+                            self.logger.info(
+                                'Player %s attempted to use a prohibited '
+                                'projectile, %s, on a protected planet.',
+                                self.protocol.player.org_name, p_type
+                            )
+                        return False
 
     def on_entity_interact_result(self, data):
         """
         Chest protection
         """
-        if (
-                self.protocol.player.planet in self.protected_planets and
-                self.protocol.player.access_level < UserLevels.ADMIN
-        ):
+        if self.verdict()[1]:
             self.logger.vdebug(
                 'User %s attmepted to interact on a protected planet.',
                 self.protocol.player.name
             )
-            name = self.protocol.player.org_name
-            if name in self.player_planets[self.protocol.player.planet]:
-                return True
-            else:
-                entity = entity_interact_result().parse(data.data)
-                if entity.interaction_type == InteractionType.OPEN_CONTAINER:
-                    self.logger.vdebug(
-                        'User %s attmepted to open container ID %s',
-                        self.protocol.player.name, entity.target_entity_id
-                    )
-                    self.logger.vdebug('This is not permitted.')
-                    return False
+            entity = data.parsed
+            if entity.interaction_type == InteractionType.OPEN_CONTAINER:
+                self.logger.vdebug(
+                    'User %s attmepted to open container ID %s',
+                    self.protocol.player.name, entity.target_entity_id
+                )
+                self.logger.vdebug('This is not permitted.')
+                return False
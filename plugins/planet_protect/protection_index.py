@@ -0,0 +1,76 @@
+class ProtectionIndex(object):
+    """
+    Which planets are protected, and who may build on each of them.
+
+    The lists in planet_protect's configuration stay the stored form; the
+    index keeps sets beside them for constant time lookups, and updates
+    both. Subscribers are called with the planet after every change, so
+    verdicts cached from the index can be dropped.
+    """
+
+    def __init__(self, protected_planets, player_planets):
+        self.protected_planets = protected_planets
+        self.player_planets = player_planets
+        self.protected = set(protected_planets)
+        self.allowed = dict(
+            (planet, set(names)) for planet, names in player_planets.iteritems()
+        )
+        self.subscribers = []
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def changed(self, planet):
+        for callback in self.subscribers:
+            callback(planet)
+
+    def __contains__(self, planet):
+        return planet in self.protected
+
+    def is_allowed(self, planet, org_name):
+        """
+        Whether a player is registered to a protected planet.
+        """
+        names = self.allowed.get(planet)
+        return names is not None and org_name in names
+
+    def players(self, planet):
+        """
+        The players registered to a planet, in the order they were added.
+        """
+        return self.player_planets.get(planet, [])
+
+    def protect(self, planet):
+        if planet not in self.protected:
+            self.protected.add(planet)
+            self.protected_planets.append(planet)
+            self.changed(planet)
+
+    def unprotect(self, planet):
+        """
+        Removes a planet's protection, and the players registered to it.
+        """
+        if planet in self.protected:
+            self.protected.discard(planet)
+            self.protected_planets.remove(planet)
+        self.player_planets.pop(planet, None)
+        self.allowed.pop(planet, None)
+        self.changed(planet)
+
+    def allow(self, planet, org_name):
+        names = self.allowed.setdefault(planet, set())
+        if org_name not in names:
+            names.add(org_name)
+            self.player_planets.setdefault(planet, []).append(org_name)
+            self.changed(planet)
+
+    def disallow(self, planet, org_name):
+        names = self.allowed.get(planet)
+        if names is not None and org_name in names:
+            names.discard(org_name)
+            self.player_planets[planet].remove(org_name)
+            self.changed(planet)
@@ -0,0 +1,92 @@
+from unittest import TestCase
+
+from mock import Mock
+
+from packets import Packets
+from plugins.planet_protect.planet_protect_plugin import PlanetProtectPlugin
+from plugins.planet_protect.protection_index import ProtectionIndex
+
+
+class ProtectionIndexTestCase(TestCase):
+    def setUp(self):
+        self.protected_planets = ['a']
+        self.player_planets = {'a': ['Owner']}
+        self.index = ProtectionIndex(
+            self.protected_planets, self.player_planets
+        )
+
+    def test_lookups(self):
+        self.assertIn('a', self.index)
+        self.assertNotIn('b', self.index)
+        self.assertTrue(self.index.is_allowed('a', 'Owner'))
+        self.assertFalse(self.index.is_allowed('a', 'Other'))
+        self.assertFalse(self.index.is_allowed('b', 'Owner'))
+
+    def test_changes_update_stored_lists(self):
+        self.index.protect('b')
+        self.index.allow('b', 'Other')
+        self.index.disallow('a', 'Owner')
+        self.assertEqual(self.protected_planets, ['a', 'b'])
+        self.assertEqual(self.player_planets, {'a': [], 'b': ['Other']})
+        self.assertTrue(self.index.is_allowed('b', 'Other'))
+        self.assertFalse(self.index.is_allowed('a', 'Owner'))
+
+        changed = Mock()
+        self.index.subscribe(changed)
+        self.index.unprotect('a')
+        changed.assert_called_once_with('a')
+        self.assertNotIn('a', self.index)
+        self.assertEqual(self.protected_planets, ['b'])
+        self.assertEqual(self.player_planets, {'b': ['Other']})
+
+
+class PlanetCheckTestCase(TestCase):
+    def setUp(self):
+        self.plugin = PlanetProtectPlugin()
+        self.plugin.plugin_config = {
+            'bad_packets': ['MODIFY_TILE_LIST', 'NOT_A_PACKET'],
+            'protected_planets': ['a'],
+            'player_planets': {'a': ['Owner']}
+        }
+        self.plugin.logger = Mock()
+        self.plugin.plugins = {
+            'player_manager_plugin': Mock(), 'command_plugin': Mock()
+        }
+        self.plugin.activate()
+        self.plugin.protocol = Mock(id='1')
+        self.player = self.plugin.protocol.player
+        self.player.configure_mock(
+            on_ship=False, planet='a', org_name='Other', access_level=0,
+            protocol='1'
+        )
+
+    def test_bad_packets_are_hooked(self):
+        self.assertEqual(
+            self.plugin.overridden_packets[Packets.MODIFY_TILE_LIST.value],
+            {'on': self.plugin.on_bad_packet}
+        )
+
+    def test_verdict_is_cached_until_world_start(self):
+        self.assertFalse(self.plugin.on_bad_packet(None))
+        self.player.planet = 'b'
+        self.assertFalse(self.plugin.on_bad_packet(None))
+
+        self.plugin.after_world_start(None)
+        self.assertTrue(self.plugin.on_bad_packet(None))
+
+    def test_verdict_follows_protection_changes(self):
+        self.assertFalse(self.plugin.planet_check())
+        self.plugin.protection.allow('a', 'Other')
+        self.assertTrue(self.plugin.planet_check())
+
+        self.plugin.protection.disallow('a', 'Other')
+        self.assertFalse(self.plugin.planet_check())
+
+    def test_verdict_follows_player_changes(self):
+        self.assertFalse(self.plugin.planet_check())
+        self.player.access_level = 100
+        self.plugin.player_changed(self.player, 'muted')
+        self.assertFalse(self.plugin.planet_check())
+
+        self.plugin.player_changed(self.player, 'access_level')
+        self.assertTrue(self.plugin.planet_check())
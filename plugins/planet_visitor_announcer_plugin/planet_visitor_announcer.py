@@ -1,5 +1,4 @@
 from base_plugin import BasePlugin
-from packets import player_warp
 from twisted.internet import reactor
 
 
@@ -13,7 +12,7 @@ class PlanetVisitorAnnouncer(BasePlugin):
         super(PlanetVisitorAnnouncer, self).activate()
 
     def after_player_warp(self, data):
-        w = player_warp().parse(data.data)
+        w = data.parsed
         if (
                 w.warp_action['warp_type'] == 1 or
                 (
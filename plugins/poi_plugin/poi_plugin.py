@@ -125,7 +125,7 @@ class PointsofInterest(SimpleCommandPlugin):
                         satellite=satellite
                     )
                 )
-                self.protocol.client_protocol.transport.write(warp_packet)
+                self.protocol.client_protocol.write(warp_packet)
                 self.protocol.send_chat_message(
                     'Warp drive engaged! Warping to ^yellow;{}^green;.'.format(
                         name
@@ -158,7 +158,7 @@ class PointsofInterest(SimpleCommandPlugin):
                         satellite=satellite
                     )
                 )
-                self.protocol.client_protocol.transport.write(warp_packet)
+                self.protocol.client_protocol.write(warp_packet)
                 self.protocol.send_chat_message(
                     'Warp drive engaged! Warping to ^yellow;Spawn^green;.'
                 )
@@ -25,7 +25,7 @@ class StarterItems(SimpleCommandPlugin):
         Syntax: /starteritems
         """
         try:
-            my_storage = self.protocol.player.storage
+            my_storage = self.protocol.player.storage_for(self.name)
         except AttributeError:
             return
 
@@ -36,15 +36,14 @@ class StarterItems(SimpleCommandPlugin):
             self.logger.info(
                 'Gave starter items to %s.', self.protocol.player.name
             )
-            self.protocol.player.storage = my_storage
         else:
             self.protocol.send_chat_message(
                 '^red;You have already received a starter pack :O'
             )
 
     def give_items(self):
-        for item in self.config.plugin_config['items']:
+        for item in self.plugin_config['items']:
             give_item_to_player(self.protocol, item[0], item[1])
 
     def send_greetings(self):
-        self.protocol.send_chat_message(self.config.plugin_config['message'])
+        self.protocol.send_chat_message(self.plugin_config['message'])
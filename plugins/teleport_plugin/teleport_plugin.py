@@ -139,7 +139,7 @@ class TeleportPlugin(SimpleCommandPlugin):
             player_warp_toplayer_write(uuid=destination_player.uuid)
         )
 
-        source_protocol.client_protocol.transport.write(teleport_packet)
+        source_protocol.client_protocol.write(teleport_packet)
 
         self.logger.debug(
             'Teleport command called by %s. Teleporting %s to %s',
@@ -213,7 +213,7 @@ class TeleportPlugin(SimpleCommandPlugin):
         #     )
         # )
 
-        # source_protocol.client_protocol.transport.write(teleport_packet)
+        # source_protocol.client_protocol.write(teleport_packet)
 
         # self.logger.debug(
         #     "Teleport command called by %s. Teleporting %s to %s's ship",
@@ -255,7 +255,7 @@ class TeleportPlugin(SimpleCommandPlugin):
             Packets.PLAYER_WARP, player_warp_toalias_write(alias=2)
         )
 
-        source_protocol.client_protocol.transport.write(teleport_packet)
+        source_protocol.client_protocol.write(teleport_packet)
 
     @permissions(UserLevels.REGISTERED)
     def teleport_to_outpost(self, data):
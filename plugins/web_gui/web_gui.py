@@ -242,6 +242,7 @@ class PlayerActionHandler(BaseHandler):
                     protocol = self.factory.protocols[
                         self.edit_player.protocol
                     ]
+                    protocol.close_output()
                     protocol.transport.loseConnection()
                 response = json.dumps(
                     {
@@ -278,6 +279,7 @@ class PlayerActionHandler(BaseHandler):
                     protocol = self.factory.protocols[
                         self.edit_player.protocol
                     ]
+                    protocol.close_output()
                     protocol.transport.loseConnection()
                     response = json.dumps(
                         {
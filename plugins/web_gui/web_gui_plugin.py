@@ -10,7 +10,6 @@ import tornado.ioloop
 
 from base_plugin import BasePlugin
 from plugins.core.player_manager_plugin import PlayerManager
-from packets import chat_sent, client_connect
 from . import web_gui
 
 
@@ -24,21 +23,21 @@ class WebGuiPlugin(BasePlugin):
     def __init__(self, *args, **kwargs):
         super(WebGuiPlugin, self).__init__(*args, **kwargs)
         try:
-            self.port = int(self.config.plugin_config['port'])
+            self.port = int(self.plugin_config['port'])
         except (AttributeError, ValueError):
             self.port = 8083
-        self.ownerpassword = self.config.plugin_config['ownerpassword']
-        self.restart_script = self.config.plugin_config['restart_script']
+        self.ownerpassword = self.plugin_config['ownerpassword']
+        self.restart_script = self.plugin_config['restart_script']
         if (
-                self.config.plugin_config['cookie_token'] == '' or
-                not self.config.plugin_config['remember_cookie_token']
+                self.plugin_config['cookie_token'] == '' or
+                not self.plugin_config['remember_cookie_token']
         ):
             self.cookie_token = self.generate_cookie_token()
-            self.config.plugin_config['cookie_token'] = (
+            self.plugin_config['cookie_token'] = (
                 self.generate_cookie_token()
             )
         else:
-            self.cookie_token = self.config.plugin_config['cookie_token']
+            self.cookie_token = self.plugin_config['cookie_token']
         self.messages = []
         self.messages_log = []
 
@@ -47,7 +46,7 @@ class WebGuiPlugin(BasePlugin):
         self.player_manager = (
             self.plugins['player_manager_plugin'].player_manager
         )
-        web_gui.WebGuiApp.config = self.config.plugin_config
+        web_gui.WebGuiApp.config = self.plugin_config
         self.web_gui_app = web_gui.WebGuiApp(
             port=self.port,
             ownerpassword=self.ownerpassword,
@@ -71,7 +70,7 @@ class WebGuiPlugin(BasePlugin):
         return ''.join(random.choice(chars) for _ in range(64))
 
     def on_chat_sent(self, data):
-        parsed = chat_sent().parse(data.data)
+        parsed = data.parsed
         msgdate = datetime.now().strftime('[%H:%M:%S]')
         message = json.dumps(
             {
@@ -86,7 +85,7 @@ class WebGuiPlugin(BasePlugin):
         return True
 
     def on_client_connect(self, data):
-        parsed = client_connect().parse(data.data)
+        parsed = data.parsed
         msgdate = datetime.now().strftime('[%H:%M:%S]')
         connect_player = self.player_manager.get_by_org_name(
             parsed.name.decode('utf-8')
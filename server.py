@@ -13,7 +13,6 @@ import logging.handlers
 from uuid import uuid4
 import sys
 import socket
-import datetime
 
 from twisted.internet import reactor
 from twisted.internet.error import CannotListenError
@@ -29,9 +28,12 @@ import construct.core
 
 from packets import Packets, Direction, chat_received
 from config import ConfigurationManager
-from packet_stream import PacketStream
+from memory_budget import ConnectionUsage, MemoryBudget
+from output_queue import OutputQueue, ReadThrottle
+from packet_stream import Packet, PacketStream
 import packets
 from plugin_manager import PluginManager, route, FatalPluginError
+from timer_wheel import TimerWheel
 from utility_functions import build_packet
 
 VERSION = '1.7.2'
@@ -81,6 +83,10 @@ class StarryPyServerProtocol(Protocol):
         self.buffering_packet = None
         self.after_write_callback = None
         self.plugin_manager = None
+        self.output = None
+        self.throttle = None
+        self.memory = ConnectionUsage()
+        self.idle_timer = self.factory.idle_timer
         self.call_mapping = {
             Packets.PROTOCOL_VERSION: self.protocol_version,
             Packets.SERVER_DISCONNECT: self.server_disconnect,  # 1
@@ -162,6 +168,12 @@ class StarryPyServerProtocol(Protocol):
         self.packet_stream = PacketStream(self)
         self.packet_stream.direction = Direction.CLIENT
         self.plugin_manager = self.factory.plugin_manager
+        self.interest = self.plugin_manager.interest[Direction.CLIENT]
+        self.packet_stream.interest = self.interest
+        self.packet_stream.selective = self.config.selective_passthrough
+        self.packet_stream.max_decompressed_size = (
+            self.config.max_decompressed_size
+        )
 
     def connectionMade(self):
         """
@@ -176,6 +188,9 @@ class StarryPyServerProtocol(Protocol):
             'Connection established from IP: %s',
             self.transport.getPeer().host
         )
+        self.throttle = ReadThrottle(self.transport)
+        self.output = OutputQueue(self.transport)
+        self.idle_timer.add(self.id)
         reactor.connectTCP(
             self.config.upstream_hostname,
             self.config.upstream_port,
@@ -194,9 +209,13 @@ class StarryPyServerProtocol(Protocol):
         :rtype : None
         """
         if 56 >= packet.id:
-            if self.handle_starbound_packets(packet):
-                self.client_protocol.transport.write(
-                    packet.original_data)
+            if not self.interest[packet.id]:
+                # Nothing hooks this packet; skip the plugin pipeline.
+                self.client_protocol.write(packet.original_data)
+                if self.after_write_callback is not None:
+                    self.after_write_callback()
+            elif self.handle_starbound_packets(packet):
+                self.client_protocol.write(packet.serialize())
                 if self.after_write_callback is not None:
                     self.after_write_callback()
         else:
@@ -204,8 +223,7 @@ class StarryPyServerProtocol(Protocol):
             logger.warning(
                 'Received unknown message ID (%d) from client.', packet.id
             )
-            self.client_protocol.transport.write(
-                packet.original_data)
+            self.client_protocol.write(packet.original_data)
 
     def dataReceived(self, data):
         """
@@ -220,8 +238,9 @@ class StarryPyServerProtocol(Protocol):
 
         :rtype : None
         """
+        self.idle_timer.touch(self.id)
         if self.config.passthrough:
-            self.client_protocol.transport.write(data)
+            self.client_protocol.write(data)
 
         else:
             self.packet_stream += data
@@ -552,16 +571,26 @@ class StarryPyServerProtocol(Protocol):
             packets.Packets.CHAT_RECEIVED, chat_data
         )
         logger.vdebug('Built chat packet. Data: %s', chat_packet.encode('hex'))
-        self.transport.write(chat_packet)
+        self.write(chat_packet)
         logger.vdebug('Sent chat message with text: %s', text)
 
     def write(self, data):
         """
-        Convenience method to send data to the client.
+        Convenience method to send data to the client. Writes made during
+        the same reactor turn are sent together.
         :param data: Data to send.
         :return: None
         """
-        self.transport.write(data)
+        self.output.write(data)
+
+    def forward_raw(self, data):
+        """
+        Sends raw frames from the client, which no plugin needs to see,
+        straight on to the Starbound server.
+        :param data: One or more complete or partial frames.
+        :return: None
+        """
+        self.client_protocol.write(data)
 
     def connectionLost(self, reason=connectionDone):
         """
@@ -573,30 +602,41 @@ class StarryPyServerProtocol(Protocol):
             logger.vdebug('Trying to disconnect protocol from factory')
             if self.client_protocol is not None:
                 logger.vdebug('The client_protocol is not None')
+                payload = packets.client_disconnect_request().build(
+                    Container(data=0)
+                )
                 x = build_packet(
-                    packets.Packets.CLIENT_DISCONNECT_REQUEST,
-                    packets.client_disconnect_request().build(
-                        Container(data=0)
-                    )
+                    packets.Packets.CLIENT_DISCONNECT_REQUEST, payload
                 )
                 logger.vdebug('Disconnect packet has been built')
                 try:
                     if self.player is not None and self.player.logged_in:
                         logger.vdebug('Player not none and is still logged in')
-                        self.client_disconnect_request(x)
+                        # Plugins are routed packets, not raw strings.
+                        self.client_disconnect_request(
+                            Packet(
+                                packet_id=(
+                                    Packets.CLIENT_DISCONNECT_REQUEST.value
+                                ),
+                                payload_size=len(payload),
+                                data=payload,
+                                original_data=x,
+                                direction=Direction.CLIENT
+                            )
+                        )
                         logger.vdebug('Client disconnect requested')
                 except:
                     logger.error('Couldn\'t complete disconnect request.')
                 finally:
-                    self.client_protocol.transport.write(x)
+                    self.client_protocol.write(x)
+                    self.client_protocol.close_output()
                     logger.vdebug('Kill packet written to transport protocol')
                     self.client_protocol.transport.abortConnection()
                     logger.vdebug('connection aborted')
-                    self.player.logged_in = 0
-                    logger.vdebug('Player status forced to logged_in=0')
         except:
             logger.error('Couldn\'t disconnect protocol.')
         finally:
+            self.idle_timer.remove(self.id)
             try:
                 self.factory.protocols.pop(self.id)
             except:
@@ -610,11 +650,61 @@ class StarryPyServerProtocol(Protocol):
                     self.transport.getPeer().host
                 )
                 logger.vdebug('Connection aborted')
+                self.close_output()
                 self.transport.abortConnection()
 
     def die(self):
         self.connectionLost()
 
+    def close_output(self):
+        """
+        Flushes and closes the output queue. Call before closing the
+        connection.
+        :return: None
+        """
+        if self.output is not None:
+            self.output.close()
+
+    def memory_usage(self):
+        """
+        Bytes held for this connection in framing buffers and pending
+        writes, on both sides of the proxy.
+        :return: int
+        """
+        usage = self.packet_stream.memory_usage
+        if self.output is not None:
+            usage += self.output.buffered_bytes
+        if self.client_protocol is not None:
+            usage += self.client_protocol.packet_stream.memory_usage
+            if self.client_protocol.output is not None:
+                usage += self.client_protocol.output.buffered_bytes
+        return usage
+
+    def pause_reading(self, reason):
+        """
+        Stops reading from both sides of the proxy until resume_reading is
+        called with the same reason.
+        :param reason: Any hashable identifying who asked.
+        :return: None
+        """
+        if self.throttle is not None:
+            self.throttle.pause(reason)
+        if self.client_protocol is not None:
+            if self.client_protocol.throttle is not None:
+                self.client_protocol.throttle.pause(reason)
+
+    def resume_reading(self, reason):
+        """
+        Undoes pause_reading for the given reason.
+        :param reason: Any hashable identifying who asked.
+        :return: None
+        """
+        if self.throttle is not None:
+            self.throttle.resume(reason)
+        if self.client_protocol is not None:
+            if self.client_protocol.throttle is not None:
+                self.client_protocol.throttle.resume(reason)
+
 
 class ClientProtocol(Protocol):
     """
@@ -624,6 +714,8 @@ class ClientProtocol(Protocol):
     def __init__(self):
         self.packet_stream = PacketStream(self)
         self.packet_stream.direction = packets.Direction.SERVER
+        self.output = None
+        self.throttle = None
         logger.debug('Client protocol instantiated.')
 
     def connectionMade(self):
@@ -635,6 +727,20 @@ class ClientProtocol(Protocol):
         :return: None
         """
         self.server_protocol.client_protocol = self
+        self.throttle = ReadThrottle(self.transport)
+        self.output = OutputQueue(
+            self.transport, source=self.server_protocol.throttle
+        )
+        self.server_protocol.output.source = self.throttle
+        self.interest = self.server_protocol.plugin_manager.interest[
+            packets.Direction.SERVER
+        ]
+        config = self.server_protocol.config
+        self.packet_stream.interest = self.interest
+        self.packet_stream.selective = config.selective_passthrough
+        self.packet_stream.max_decompressed_size = (
+            config.max_decompressed_size
+        )
 
     def string_received(self, packet):
         """
@@ -648,15 +754,36 @@ class ClientProtocol(Protocol):
 
         :return: None
         """
+        if not self.interest[packet.id]:
+            self.server_protocol.write(packet.original_data)
+            return
         try:
             if self.server_protocol.handle_starbound_packets(
                     packet):
-                self.server_protocol.write(packet.original_data)
+                self.server_protocol.write(packet.serialize())
         except construct.core.FieldError:
             logger.exception('Construct field error in string_received.')
             self.server_protocol.write(
                 packet.original_data)
 
+    def write(self, data):
+        """
+        Convenience method to send data to the Starbound server. Writes made
+        during the same reactor turn are sent together.
+        :param data: Data to send.
+        :return: None
+        """
+        self.output.write(data)
+
+    def forward_raw(self, data):
+        """
+        Sends raw frames from the Starbound server, which no plugin needs to
+        see, straight on to the client.
+        :param data: One or more complete or partial frames.
+        :return: None
+        """
+        self.server_protocol.write(data)
+
     def dataReceived(self, data):
         """
         Called whenever a packet is received. Generally this should not be
@@ -668,6 +795,7 @@ class ClientProtocol(Protocol):
         :param data: Raw packet data from the Starbound server.
         :return: None
         """
+        self.server_protocol.idle_timer.touch(self.server_protocol.id)
         if self.server_protocol.config.passthrough:
             self.server_protocol.write(data)
         else:
@@ -679,10 +807,28 @@ class ClientProtocol(Protocol):
             packets.Packets.CLIENT_DISCONNECT_REQUEST,
             packets.client_disconnect_request().build(Container(data=0))
         )
-        self.transport.write(x)
+        self.write(x)
+        self.close_output()
         self.transport.abortConnection()
         logger.vdebug('Client protocol disconnected.')
 
+    def close_output(self):
+        """
+        Flushes and closes the output queue. Call before closing the
+        connection.
+        :return: None
+        """
+        if self.output is not None:
+            self.output.close()
+
+    def connectionLost(self, reason=connectionDone):
+        """
+        Called when the connection to the Starbound server is lost.
+        :param reason: The reason for the disconnection.
+        :return: None
+        """
+        self.close_output()
+
 
 class StarryPyServerFactory(ServerFactory):
     """
@@ -704,8 +850,21 @@ class StarryPyServerFactory(ServerFactory):
         except FatalPluginError:
             logger.critical('Shutting Down.')
             sys.exit()
+        self.idle_timer = TimerWheel(self.config.reap_time)
         self.reaper = LoopingCall(self.reap_dead_protocols)
-        self.reaper.start(self.config.reap_time)
+        self.reaper.start(self.idle_timer.tick)
+        try:
+            self.memory_budget = MemoryBudget(
+                self.config.connection_memory_limit,
+                self.config.global_memory_limit,
+                self.config.memory_grace_period,
+                self.config.max_decompressed_size
+            )
+        except ValueError as e:
+            logger.critical('%s Shutting Down.', e)
+            sys.exit()
+        self.memory_check = LoopingCall(self.check_memory)
+        self.memory_check.start(1)
         logger.debug(
             'Factory created, endpoint of port %d', self.config.bind_port
         )
@@ -716,8 +875,8 @@ class StarryPyServerFactory(ServerFactory):
         :return: None
         """
 
-        self.config.save()
         self.plugin_manager.die()
+        self.config.flush()
 
     def broadcast(self, text, name=''):
         """
@@ -762,40 +921,32 @@ class StarryPyServerFactory(ServerFactory):
         p = ServerFactory.buildProtocol(self, address)
         return p
 
+    def check_memory(self):
+        """
+        Applies the memory budget to every connected protocol.
+        :return: None
+        """
+        self.memory_budget.check(
+            list(self.protocols.itervalues()), reactor.seconds()
+        )
+
     def reap_dead_protocols(self):
         logger.vdebug('Reaping dead connections.')
         count = 0
-        start_time = datetime.datetime.now()
-        for protocol in self.protocols.itervalues():
-            total_seconds = (
-                protocol
-                .client_protocol
-                .packet_stream
-                .last_received_timestamp -
-                start_time
-            ).total_seconds()
-            if total_seconds > self.config.reap_time:
-                logger.debug(
-                    'Reaping protocol %s. Reason: Server protocol timeout.',
-                    protocol.id
-                )
-                protocol.connectionLost()
-                count += 1
+        for protocol_id in self.idle_timer.advance():
+            protocol = self.protocols.get(protocol_id)
+            if protocol is None:
                 continue
-            if (
-                    protocol.client_protocol is not None and
-                    total_seconds > self.config.reap_time
-            ):
-                protocol.connectionLost()
-                logger.debug(
-                    'Reaping protocol %s. Reason: Client protocol timeout.',
-                    protocol.id
-                )
-                count += 1
+            logger.debug(
+                'Reaping protocol %s. Reason: No data for %d seconds.',
+                protocol_id, self.config.reap_time
+            )
+            protocol.connectionLost()
+            count += 1
         if count == 1:
             logger.info('1 connection reaped.')
         elif count > 1:
-            logger.info('%d connections reaped.')
+            logger.info('%d connections reaped.', count)
         else:
             logger.vdebug('No connections reaped.')
 
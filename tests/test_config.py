@@ -0,0 +1,142 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import patch
+from twisted.internet.defer import maybeDeferred
+from twisted.internet.task import Clock
+from twisted.python.filepath import FilePath
+
+from config import ConfigurationManager, PluginConfig
+
+
+def make_config_manager(config):
+    # Skips __init__, which loads config.json.
+    config_manager = object.__new__(ConfigurationManager)
+    with patch.object(ConfigurationManager, 'save'):
+        config_manager.config = config
+    return config_manager
+
+
+class PluginConfigTestCase(TestCase):
+    def setUp(self):
+        self.config_manager = make_config_manager(
+            {'plugin_config': {'motd': {'motd': 'Hello'}}}
+        )
+
+    def test_reads_section(self):
+        view = self.config_manager.plugin_config_for('motd')
+
+        self.assertIsInstance(view, PluginConfig)
+        self.assertEqual(view['motd'], 'Hello')
+        self.assertEqual(dict(view), {'motd': 'Hello'})
+        self.assertIn('motd', view)
+
+    def test_missing_section(self):
+        view = self.config_manager.plugin_config_for('other')
+
+        self.assertEqual(view.get('motd', 'default'), 'default')
+        self.assertEqual(len(view), 0)
+        view.update({'key': 'value'})
+        self.assertEqual(
+            self.config_manager.config['plugin_config']['other'],
+            {'key': 'value'}
+        )
+
+    def test_follows_replaced_config(self):
+        view = self.config_manager.plugin_config_for('motd')
+        with patch.object(ConfigurationManager, 'save'):
+            self.config_manager.config = {
+                'plugin_config': {'motd': {'motd': 'Bye'}}
+            }
+
+        self.assertEqual(view['motd'], 'Bye')
+
+
+class SnapshotTestCase(TestCase):
+    def test_options_are_instance_attributes(self):
+        config_manager = make_config_manager(
+            {'colors': {'default': '^white;'}, 'plugin_config': {}}
+        )
+
+        self.assertEqual(
+            config_manager.__dict__['colors'], {'default': '^white;'}
+        )
+        self.assertNotIn('plugin_config', config_manager.__dict__)
+
+    def test_setting_updates_snapshot(self):
+        config_manager = make_config_manager(
+            {'chattimestamps': True, 'plugin_config': {}}
+        )
+        with patch.object(ConfigurationManager, 'save'):
+            config_manager.chattimestamps = False
+            config_manager.server_name = 'Test'
+
+        self.assertFalse(config_manager.chattimestamps)
+        self.assertFalse(config_manager.config['chattimestamps'])
+        self.assertEqual(config_manager.__dict__['server_name'], 'Test')
+
+        with patch.object(ConfigurationManager, 'save'):
+            config_manager.config = {'plugin_config': {}}
+        self.assertNotIn('chattimestamps', config_manager.__dict__)
+
+
+class SaveTestCase(TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.config_manager = make_config_manager(
+            {'config_save_delay': 2, 'plugin_config': {}, 'server_name': 'a'}
+        )
+        self.config_manager.config_path = FilePath(
+            os.path.join(self.tempdir, 'config.json')
+        )
+        self.clock = Clock()
+        self.config_manager.__dict__['clock'] = self.clock
+        self.writes = []
+        patcher = patch('config.threads.deferToThread', self.defer_to_thread)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        # The class keeps the save state shared by the singleton.
+        for name in ['_save_call', '_save_pending', '_save_version',
+                     '_saved_version']:
+            self.config_manager.__dict__.pop(name, None)
+
+    def defer_to_thread(self, f, *args):
+        self.writes.append(args)
+        return maybeDeferred(f, *args)
+
+    def stored(self):
+        with open(self.config_manager.config_path.path) as f:
+            return json.load(f)
+
+    def test_saves_are_coalesced(self):
+        self.config_manager.server_name = 'b'
+        self.clock.advance(1)
+        self.config_manager.server_name = 'c'
+        self.assertFalse(self.config_manager.config_path.exists())
+
+        self.clock.advance(1)
+        self.assertEqual(len(self.writes), 1)
+        self.assertEqual(self.stored()['server_name'], 'c')
+        self.assertEqual(os.listdir(self.tempdir), ['config.json'])
+
+    def test_flush(self):
+        self.config_manager.server_name = 'b'
+        self.config_manager.flush()
+
+        self.assertEqual(self.stored()['server_name'], 'b')
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+    def test_older_snapshot_is_not_written(self):
+        self.config_manager.server_name = 'b'
+        snapshot = self.config_manager._take_snapshot()
+        self.config_manager.server_name = 'c'
+        self.config_manager.flush()
+
+        self.config_manager._write(*snapshot)
+        self.assertEqual(self.stored()['server_name'], 'c')
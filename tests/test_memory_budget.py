@@ -0,0 +1,73 @@
+from unittest import TestCase
+
+from mock import Mock
+
+from memory_budget import ConnectionUsage, MemoryBudget
+
+
+def make_protocol(usage):
+    protocol = Mock()
+    protocol.memory = ConnectionUsage()
+    protocol.memory_usage.return_value = usage
+    return protocol
+
+
+class MemoryBudgetTestCase(TestCase):
+    def setUp(self):
+        self.budget = MemoryBudget(
+            connection_limit=100, global_limit=250, grace_period=10
+        )
+
+    def test_limit_must_fit_a_packet(self):
+        with self.assertRaises(ValueError):
+            MemoryBudget(
+                connection_limit=100, global_limit=250, grace_period=10,
+                max_packet_size=100
+            )
+        MemoryBudget(
+            connection_limit=101, global_limit=250, grace_period=10,
+            max_packet_size=100
+        )
+
+    def test_within_budget(self):
+        protocol = make_protocol(50)
+        self.budget.check([protocol], 0)
+
+        self.assertFalse(protocol.pause_reading.called)
+        self.assertEqual(protocol.memory.current, 50)
+        self.assertEqual(self.budget.current, 50)
+
+    def test_throttle_then_disconnect(self):
+        protocol = make_protocol(150)
+        self.budget.check([protocol], 0)
+        protocol.pause_reading.assert_called_once_with(self.budget)
+        self.assertFalse(protocol.die.called)
+
+        self.budget.check([protocol], 5)
+        self.assertEqual(protocol.pause_reading.call_count, 1)
+        self.assertFalse(protocol.die.called)
+
+        self.budget.check([protocol], 10)
+        self.assertTrue(protocol.die.called)
+
+    def test_resume_when_back_within_budget(self):
+        protocol = make_protocol(150)
+        self.budget.check([protocol], 0)
+
+        protocol.memory_usage.return_value = 20
+        self.budget.check([protocol], 1)
+        protocol.resume_reading.assert_called_once_with(self.budget)
+        self.assertIsNone(protocol.memory.over_since)
+        self.assertEqual(protocol.memory.current, 20)
+        self.assertEqual(protocol.memory.peak, 150)
+
+    def test_global_budget_sheds_heaviest(self):
+        light = make_protocol(60)
+        heavy = make_protocol(99)
+        medium = make_protocol(98)
+        self.budget.check([light, heavy, medium], 0)
+
+        self.assertEqual(self.budget.current, 257)
+        self.assertTrue(heavy.pause_reading.called)
+        self.assertFalse(medium.pause_reading.called)
+        self.assertFalse(light.pause_reading.called)
@@ -0,0 +1,95 @@
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from output_queue import OutputQueue, ReadThrottle
+
+
+class OutputQueueTestCase(TestCase):
+    def setUp(self):
+        patcher = patch('output_queue.reactor')
+        self.mock_reactor = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.transport = Mock(
+            spec=['registerProducer', 'unregisterProducer', 'writeSequence']
+        )
+        self.source = Mock()
+        self.queue = OutputQueue(self.transport, source=self.source)
+
+    def test_registers_as_producer(self):
+        self.transport.registerProducer.assert_called_with(self.queue, True)
+
+    def test_writes_are_coalesced(self):
+        self.queue.write('one')
+        self.queue.write('two')
+        self.queue.write('three')
+
+        self.mock_reactor.callLater.assert_called_once_with(
+            0, self.queue.flush
+        )
+        self.assertEqual(self.queue.pending_bytes, 11)
+        self.assertEqual(self.queue.buffered_bytes, 11)
+
+        self.queue.flush()
+        self.transport.writeSequence.assert_called_once_with(
+            ['one', 'two', 'three']
+        )
+        self.assertEqual(self.queue.pending, [])
+        self.assertEqual(self.queue.pending_bytes, 0)
+
+    def test_flush_cancels_scheduled_flush(self):
+        self.queue.write('data')
+        flush_call = self.mock_reactor.callLater.return_value
+        flush_call.active.return_value = True
+
+        self.queue.flush()
+        self.assertTrue(flush_call.cancel.called)
+        self.assertIsNone(self.queue.flush_call)
+
+        self.queue.flush()
+        self.assertEqual(self.transport.writeSequence.call_count, 1)
+
+    def test_close_flushes_and_unregisters(self):
+        self.queue.write('data')
+        self.queue.pauseProducing()
+        self.queue.close()
+        self.queue.close()
+
+        self.transport.writeSequence.assert_called_once_with(['data'])
+        self.transport.unregisterProducer.assert_called_once_with()
+        self.assertTrue(self.queue.closed)
+
+    def test_backpressure_pauses_source(self):
+        self.queue.pauseProducing()
+        self.assertTrue(self.queue.paused)
+        self.source.pause.assert_called_with(self.queue)
+
+        self.queue.resumeProducing()
+        self.assertFalse(self.queue.paused)
+        self.source.resume.assert_called_with(self.queue)
+
+    def test_stop_producing_drops_pending(self):
+        self.queue.write('data')
+        self.queue.stopProducing()
+
+        self.assertEqual(self.queue.pending, [])
+        self.assertIsNone(self.queue.flush_call)
+
+
+class ReadThrottleTestCase(TestCase):
+    def test_resumes_when_no_reason_left(self):
+        transport = Mock()
+        throttle = ReadThrottle(transport)
+
+        throttle.pause('backpressure')
+        throttle.pause('memory')
+        self.assertEqual(transport.pauseProducing.call_count, 1)
+        self.assertTrue(throttle.paused)
+
+        throttle.resume('backpressure')
+        self.assertFalse(transport.resumeProducing.called)
+
+        throttle.resume('memory')
+        throttle.resume('memory')
+        self.assertEqual(transport.resumeProducing.call_count, 1)
+        self.assertFalse(throttle.paused)
@@ -0,0 +1,91 @@
+from unittest import TestCase
+
+from construct import Container
+
+from packets import SignedVLQ, VLQ, packet, start_packet
+from packets.header import (
+    read_header,
+    read_signed_vlq,
+    read_vlq,
+    write_header,
+    write_signed_vlq,
+    write_vlq
+)
+
+
+VALUES = [0, 1, 63, 64, 127, 128, 255, 16383, 16384, 2 ** 21, 2 ** 35 + 7]
+# Encodings as written by the construct builders these replaced.
+VLQ_BYTES = [
+    (0, '\x00'),
+    (1, '\x01'),
+    (127, '\x7f'),
+    (128, '\x81\x00'),
+    (16383, '\xff\x7f'),
+    (16384, '\x81\x80\x00'),
+    (2 ** 21, '\x81\x80\x80\x00'),
+    (2 ** 35 + 7, '\x81\x80\x80\x80\x80\x07')
+]
+SIGNED_VLQ_BYTES = [
+    (0, '\x00'),
+    (1, '\x02'),
+    (-1, '\x01'),
+    (63, '\x7e'),
+    (-64, '\x7f'),
+    (64, '\x81\x00'),
+    (-65, '\x81\x01'),
+    (8191, '\xff\x7e'),
+    (-8192, '\xff\x7f'),
+    (2 ** 20, '\x81\x80\x80\x00'),
+    (-(2 ** 20) - 1, '\x81\x80\x80\x01')
+]
+
+
+class PacketHeaderTestCase(TestCase):
+    def test_write_vlq(self):
+        for value, expected in VLQ_BYTES:
+            self.assertEqual(write_vlq(value), expected)
+            self.assertEqual(VLQ('').build(value), expected)
+
+    def test_write_signed_vlq(self):
+        for value, expected in SIGNED_VLQ_BYTES:
+            self.assertEqual(write_signed_vlq(value), expected)
+            self.assertEqual(SignedVLQ('').build(value), expected)
+
+    def test_write_vlq_negative(self):
+        with self.assertRaises(ValueError):
+            write_vlq(-1)
+
+    def test_read_round_trip(self):
+        for value in VALUES:
+            data = bytearray('junk' + write_vlq(value) + 'tail')
+            self.assertEqual(read_vlq(data, 4), (value, len(data) - 4))
+        for value in VALUES + [-v for v in VALUES]:
+            data = bytearray(write_signed_vlq(value))
+            self.assertEqual(read_signed_vlq(data), (value, len(data)))
+
+    def test_read_incomplete(self):
+        data = bytearray(write_vlq(2 ** 21))
+        self.assertIsNone(read_vlq(data[:-1]))
+        self.assertIsNone(read_signed_vlq(bytearray()))
+        self.assertIsNone(read_header(bytearray('\x05')))
+
+    def test_read_header_matches_construct(self):
+        for size in VALUES[:-1] + [-v for v in VALUES[1:-1]]:
+            raw = packet().build(
+                Container(id=17, payload_size=size, data='x' * abs(size))
+            )
+            parsed = start_packet().parse(raw)
+            header = read_header(bytearray(raw))
+            self.assertEqual(
+                header,
+                (
+                    parsed.id,
+                    abs(parsed.payload_size),
+                    parsed.payload_size < 0,
+                    1 + len(SignedVLQ('').build(parsed.payload_size))
+                )
+            )
+            self.assertEqual(
+                write_header(17, abs(size), size < 0),
+                raw[:header[3]]
+            )
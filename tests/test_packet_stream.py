@@ -0,0 +1,303 @@
+import zlib
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from packet_stream import Packet, PacketStream, PacketTooLarge
+from packets import Packets, packet, chat_sent_write
+from construct import Container
+from utility_functions import build_packet
+
+
+def build_compressed_packet(packet_type, data):
+    compressed = zlib.compress(data)
+    return packet().build(
+        Container(
+            id=packet_type,
+            payload_size=-len(compressed),
+            data=compressed
+        )
+    )
+
+
+class PacketStreamTestCase(TestCase):
+    def setUp(self):
+        self.protocol = Mock()
+        self.stream = PacketStream(self.protocol)
+
+    def received(self):
+        return [
+            c[0][0] for c in self.protocol.string_received.call_args_list
+        ]
+
+    def test_single_packet(self):
+        raw = build_packet(Packets.CHAT_SENT, 'hello')
+        self.stream += raw
+
+        packets = self.received()
+        self.assertEqual(len(packets), 1)
+        self.assertEqual(packets[0].id, Packets.CHAT_SENT)
+        self.assertEqual(packets[0].data, 'hello')
+        self.assertEqual(packets[0].original_data, raw)
+        self.assertEqual(self.stream.buffered, 0)
+
+    def test_packet_split_across_chunks(self):
+        payload = 'x' * 5000
+        raw = build_packet(Packets.WORLD_START, payload)
+        for i in xrange(0, len(raw), 7):
+            self.stream += raw[i:i + 7]
+
+        packets = self.received()
+        self.assertEqual(len(packets), 1)
+        self.assertEqual(packets[0].data, payload)
+        self.assertEqual(packets[0].original_data, raw)
+
+    def test_multiple_packets_in_one_chunk(self):
+        raws = [
+            build_packet(Packets.STEP_UPDATE, chr(i)) for i in xrange(50)
+        ]
+        tail = build_packet(Packets.ENTITY_UPDATE, 'tail data')
+        self.stream += ''.join(raws) + tail[:3]
+
+        packets = self.received()
+        self.assertEqual([p.original_data for p in packets], raws)
+        self.assertEqual(self.stream.buffered, 3)
+
+        self.stream += tail[3:]
+        self.assertEqual(self.received()[-1].data, 'tail data')
+        self.assertEqual(self.stream.buffered, 0)
+
+    def test_compressed_packet(self):
+        payload = 'compress me ' * 100
+        raw = build_compressed_packet(Packets.TILE_ARRAY_UPDATE, payload)
+        self.stream += raw
+
+        packets = self.received()
+        self.assertEqual(len(packets), 1)
+        self.assertEqual(packets[0].data, payload)
+        self.assertEqual(packets[0].original_data, raw)
+        self.assertLess(packets[0].payload_size, 0)
+
+    def test_drain_counters(self):
+        raws = ''.join(
+            build_packet(Packets.ENTITY_UPDATE, 'x' * i) for i in xrange(300)
+        )
+        self.stream._buffer.extend(raws + '\x30')
+
+        packets = self.stream.drain()
+        self.assertEqual(len(packets), 300)
+        self.assertEqual(self.stream.frames_drained, 300)
+        self.assertEqual(self.stream.bytes_pending, 1)
+        self.assertFalse(self.protocol.string_received.called)
+
+    def test_empty_payload(self):
+        self.stream += build_packet(Packets.STEP_UPDATE, '')
+
+        packets = self.received()
+        self.assertEqual(len(packets), 1)
+        self.assertEqual(packets[0].data, '')
+
+    def test_bad_compressed_packet_is_dropped(self):
+        bad = packet().build(
+            Container(id=Packets.WORLD_START, payload_size=-4, data='junk')
+        )
+        good = build_packet(Packets.CHAT_SENT, 'still here')
+        self.stream += bad + good
+
+        packets = self.received()
+        self.assertEqual(len(packets), 1)
+        self.assertEqual(packets[0].data, 'still here')
+
+    def test_handler_error_does_not_stop_dispatch(self):
+        self.protocol.string_received.side_effect = [ValueError, None]
+        self.stream += (
+            build_packet(Packets.CHAT_SENT, 'one') +
+            build_packet(Packets.CHAT_SENT, 'two')
+        )
+
+        self.assertEqual(self.received()[1].data, 'two')
+
+    def test_compressed_packet_inflated_as_it_arrives(self):
+        payload = ''.join(chr(i % 251) for i in xrange(20000))
+        raw = build_compressed_packet(Packets.WORLD_START, payload)
+        for i in xrange(0, len(raw) - 1, 100):
+            self.stream += raw[i:i + 100]
+            if self.stream.buffered:
+                self.assertGreater(self.stream._decompressed_size, 0)
+
+        self.assertEqual(self.received()[0].data, payload)
+        self.assertEqual(self.received()[0].original_data, raw)
+
+    def test_compressed_packet_too_large(self):
+        self.stream.max_decompressed_size = 1000
+        self.stream += build_compressed_packet(
+            Packets.WORLD_START, 'x' * 1001
+        )
+        self.stream += build_packet(Packets.CHAT_SENT, 'ignored')
+
+        self.assertFalse(self.protocol.string_received.called)
+        self.assertTrue(self.protocol.close_output.called)
+        self.assertTrue(self.protocol.transport.loseConnection.called)
+        self.assertEqual(self.stream.buffered, 0)
+
+    def test_unhooked_compressed_packet_not_inflated(self):
+        self.stream.interest = bytearray(256)
+        raw = build_compressed_packet(Packets.WORLD_START, 'payload')
+        with patch('packet_stream.zlib') as mock_zlib:
+            self.stream += raw
+            self.assertFalse(mock_zlib.decompressobj.called)
+
+        packet = self.received()[0]
+        self.assertEqual(packet.original_data, raw)
+        self.assertEqual(packet.data, 'payload')
+
+    def test_unhooked_compressed_packet_too_large(self):
+        self.stream.interest = bytearray(256)
+        self.stream.max_decompressed_size = 1000
+        self.stream += build_compressed_packet(
+            Packets.WORLD_START, 'x' * 1001
+        )
+
+        packet = self.received()[0]
+        with self.assertRaises(PacketTooLarge):
+            packet.data
+
+
+class SelectivePassthroughTestCase(TestCase):
+    def setUp(self):
+        self.protocol = Mock()
+        self.stream = PacketStream(self.protocol)
+        self.stream.interest = bytearray(256)
+        self.stream.interest[Packets.CHAT_SENT] = 1
+        self.stream.selective = True
+
+    def forwarded(self):
+        return [
+            c[0][0] for c in self.protocol.forward_raw.call_args_list
+        ]
+
+    def test_runs_are_spliced(self):
+        run_one = ''.join(
+            build_packet(Packets.ENTITY_UPDATE, 'x' * i) for i in xrange(10)
+        )
+        chat = build_packet(Packets.CHAT_SENT, 'hello')
+        run_two = build_compressed_packet(
+            Packets.WORLD_START, 'y' * 100
+        ) + build_packet(Packets.STEP_UPDATE, '\x01')
+        self.stream += run_one + chat + run_two
+
+        self.assertEqual(self.forwarded(), [run_one, run_two])
+        self.protocol.string_received.assert_called_once()
+        self.assertEqual(
+            self.protocol.string_received.call_args[0][0].original_data, chat
+        )
+        self.assertEqual(self.stream.frames_drained, 13)
+        self.assertEqual(self.stream.buffered, 0)
+
+    def test_uninteresting_frame_forwarded_as_it_arrives(self):
+        raw = build_packet(Packets.WORLD_START, 'z' * 5000)
+        chat = build_packet(Packets.CHAT_SENT, 'after')
+        data = raw + chat
+        for i in xrange(0, len(data), 1000):
+            self.stream += data[i:i + 1000]
+
+        self.assertEqual(''.join(self.forwarded()), raw)
+        self.assertGreater(len(self.forwarded()), 1)
+        self.assertEqual(
+            self.protocol.string_received.call_args[0][0].data, 'after'
+        )
+        self.assertEqual(self.stream.buffered, 0)
+
+    def test_interesting_frame_waits_for_payload(self):
+        chat = build_packet(Packets.CHAT_SENT, 'wait for me')
+        self.stream += chat[:4]
+
+        self.assertFalse(self.protocol.forward_raw.called)
+        self.assertFalse(self.protocol.string_received.called)
+
+        self.stream += chat[4:]
+        self.assertEqual(
+            self.protocol.string_received.call_args[0][0].data, 'wait for me'
+        )
+
+
+class PacketTestCase(TestCase):
+    def make_packet(self, message):
+        data = chat_sent_write(message, 'BROADCAST')
+        return Packet(
+            packet_id=Packets.CHAT_SENT,
+            payload_size=len(data),
+            data=data,
+            original_data=build_packet(Packets.CHAT_SENT, data),
+            direction=None
+        )
+
+    @patch('packet_stream.packet_struct')
+    def test_parsed_is_memoized(self, mock_packet_struct):
+        packet = self.make_packet('hello')
+        mock_packet_struct.return_value.parse.return_value = 'parsed'
+
+        self.assertEqual(packet.parsed, 'parsed')
+        self.assertEqual(packet.parsed, 'parsed')
+        self.assertEqual(mock_packet_struct.return_value.parse.call_count, 1)
+
+    def test_parsed_without_struct(self):
+        packet = Packet(0xff, 0, '', build_packet(0xff, ''), None)
+        self.assertIsNone(packet.parsed)
+
+    def test_serialize_unchanged(self):
+        packet = self.make_packet('hello')
+        raw = packet.original_data
+        self.assertEqual(packet.parsed.message, 'hello')
+
+        self.assertFalse(packet.dirty)
+        self.assertIs(packet.serialize(), raw)
+
+    def test_serialize_dirty(self):
+        packet = self.make_packet('hello')
+        packet.parsed.message = 'goodbye'
+        self.assertTrue(packet.dirty)
+
+        self.assertEqual(
+            packet.serialize(),
+            self.make_packet('goodbye').original_data
+        )
+        self.assertFalse(packet.dirty)
+
+    def test_dict_methods_mark_dirty(self):
+        for edit in [
+            lambda parsed: parsed.pop('message'),
+            lambda parsed: parsed.popitem(),
+            lambda parsed: parsed.clear(),
+            lambda parsed: parsed.update(message='goodbye'),
+            lambda parsed: parsed.update({'message': 'goodbye'}),
+            lambda parsed: parsed.setdefault('new', 1)
+        ]:
+            packet = self.make_packet('hello')
+            edit(packet.parsed)
+            self.assertTrue(packet.dirty)
+
+        packet = self.make_packet('hello')
+        self.assertEqual(packet.parsed.pop('missing', None), None)
+        self.assertEqual(packet.parsed.setdefault('message'), 'hello')
+        self.assertFalse(packet.dirty)
+
+    def test_copy_is_detached(self):
+        packet = self.make_packet('hello')
+        copy = packet.parsed.copy()
+        self.assertEqual(copy, packet.parsed)
+        self.assertEqual(copy.keys(), packet.parsed.keys())
+
+        copy.message = 'goodbye'
+        self.assertEqual(packet.parsed.message, 'hello')
+        self.assertFalse(packet.dirty)
+
+    def test_mark_dirty_rebuilds(self):
+        packet = self.make_packet('hello')
+        raw = packet.original_data
+        packet.parsed
+        packet.mark_dirty()
+
+        rebuilt = packet.serialize()
+        self.assertIsNot(rebuilt, raw)
+        self.assertEqual(rebuilt, raw)
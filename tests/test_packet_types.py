@@ -0,0 +1,50 @@
+from unittest import TestCase
+
+from construct import Container
+
+from packets import (
+    Packets,
+    Variant,
+    chat_received,
+    chat_sent,
+    packet_struct,
+    star_string
+)
+
+
+class PacketStructsTestCase(TestCase):
+    def test_factories_are_cached(self):
+        self.assertIs(chat_sent(), chat_sent())
+        self.assertIs(star_string('x'), star_string('x'))
+        self.assertIsNot(chat_sent(), chat_sent('renamed'))
+        self.assertEqual(chat_sent('renamed').name, 'renamed')
+
+    def test_registry_shares_factory_instances(self):
+        self.assertIs(packet_struct(Packets.CHAT_SENT), chat_sent())
+        self.assertIs(packet_struct(Packets.CHAT_RECEIVED), chat_received())
+        self.assertIsNone(packet_struct(Packets.CELESTIAL_RESPONSE))
+
+    def test_cached_struct_round_trip(self):
+        message = Container(
+            mode='BROADCAST',
+            channel='',
+            client_id=0,
+            name='name',
+            message='first'
+        )
+        first = chat_received().parse(chat_received().build(message))
+        message.message = 'second'
+        second = chat_received().parse(chat_received().build(message))
+        self.assertEqual(first.message, 'first')
+        self.assertEqual(second.message, 'second')
+
+    def test_nested_variants(self):
+        # Dict variant holding a string and a list of two signed VLQs.
+        raw = (
+            '\x07\x02'
+            '\x01a\x05\x03abc'
+            '\x01b\x06\x02\x04\x02\x04\x03'
+        )
+        self.assertEqual(
+            Variant('').parse(raw), {'a': 'abc', 'b': [1, -2]}
+        )
@@ -2,6 +2,7 @@ from unittest import TestCase
 
 from mock import Mock, patch, call
 
+from packets import Direction, Packets
 from plugin_manager import PluginManager, route
 
 
@@ -18,6 +19,7 @@ class PluginManagetTestCase(TestCase):
         mock_path.child.return_value = Mock(path='test child')
         mock_config.return_value = Mock(
             plugin_path='test path',
+            inspected_packets=[],
             config={
                 'initial_plugins': 'test initial plugins'
             }
@@ -200,42 +202,113 @@ class PluginManagetTestCase(TestCase):
             }
         )
 
+    @patch('plugin_manager.sys')
+    @patch('plugin_manager.path')
+    @patch('plugin_manager.ConfigurationManager')
+    def test_interest(self, mock_config, mock_path, mock_sys):
+        mock_plugin = Mock()
+        mock_plugin.name = 'Test'
+        mock_plugin.overridden_packets = {
+            Packets.CHAT_SENT: {'on': 'on chat sent'},
+            Packets.WORLD_START: {'after': 'after world start'}
+        }
+
+        mock_config.return_value.inspected_packets = [
+            'PLAYER_WARP', 'NOT_A_PACKET'
+        ]
+
+        pm = PluginManager(Mock())
+        client_interest = pm.interest[Direction.CLIENT]
+        pm.map_plugin_packets(mock_plugin)
+
+        for direction in (Direction.CLIENT, Direction.SERVER):
+            interest = pm.interest[direction]
+            self.assertTrue(interest[Packets.CHAT_SENT])
+            self.assertTrue(interest[Packets.WORLD_START])
+            self.assertFalse(interest[Packets.ENTITY_UPDATE])
+            self.assertFalse(interest[Packets.STEP_UPDATE])
+            self.assertTrue(interest[Packets.PLAYER_WARP])
+
+        pm.de_map_plugin_packets(mock_plugin)
+        self.assertIs(pm.interest[Direction.CLIENT], client_interest)
+        self.assertFalse(client_interest[Packets.CHAT_SENT])
+        self.assertFalse(client_interest[Packets.WORLD_START])
+        self.assertTrue(client_interest[Packets.PLAYER_WARP])
+
+
+class AfterQueueTestCase(TestCase):
+    def setUp(self):
+        config_patcher = patch('plugin_manager.ConfigurationManager')
+        mock_config = config_patcher.start()
+        mock_config.return_value = Mock(
+            after_hook_interval=.01,
+            after_hook_batch_size=2,
+            inspected_packets=[]
+        )
+        self.addCleanup(config_patcher.stop)
+        for target in ('plugin_manager.sys', 'plugin_manager.path'):
+            patcher = patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.pm = PluginManager(Mock())
+        self.pm.packets = {1: {'after': {'Test': 'hook'}}, 2: {'on': {}}}
+        self.pm.do = Mock()
+
+    @patch('plugin_manager.reactor')
+    def test_schedule_after_coalesces(self, mock_reactor):
+        for i in xrange(3):
+            self.pm.schedule_after('protocol', Mock(id=1))
+
+        mock_reactor.callLater.assert_called_once_with(
+            .01, self.pm.run_after_hooks
+        )
+        self.assertEqual(self.pm.after_queue_metrics()['depth'], 3)
 
-class RouteTestCase(TestCase):
     @patch('plugin_manager.reactor')
-    @patch('plugin_manager.deferLater')
-    @patch('plugin_manager.logging')
-    def test_route_response_true(self, mock_logging, mock_defer, mock_reactor):
+    def test_schedule_after_without_hooks(self, mock_reactor):
+        self.pm.schedule_after('protocol', Mock(id=2))
+        self.pm.schedule_after('protocol', Mock(id=3))
+
+        self.assertFalse(mock_reactor.callLater.called)
+        self.assertEqual(len(self.pm.after_queue), 0)
+
+    @patch('plugin_manager.reactor')
+    def test_run_after_hooks_in_batches(self, mock_reactor):
+        data = [Mock(id=1) for _ in xrange(3)]
+        for d in data:
+            self.pm.schedule_after('protocol', d)
+
+        self.pm.run_after_hooks()
+        self.assertEqual(
+            self.pm.do.call_args_list,
+            [call('protocol', 'after', d) for d in data[:2]]
+        )
+        self.assertEqual(mock_reactor.callLater.call_count, 2)
+
+        self.pm.run_after_hooks()
+        self.pm.do.assert_called_with('protocol', 'after', data[2])
+        self.assertIsNone(self.pm.after_call)
+        self.assertDictEqual(
+            self.pm.after_queue_metrics(), {'depth': 0, 'peak': 3, 'run': 3}
+        )
+
+
+class RouteTestCase(TestCase):
+    def test_route_response_true(self):
         test_func = Mock()
         mock_pm = Mock()
         mock_self = Mock()
         mock_self.plugin_manager = mock_pm
-        add_err_back = Mock()
-        mock_defer.return_value = add_err_back
-        logger = Mock()
-        mock_logging.getLogger.return_value = logger
 
         test_f = route(test_func)
         test_f(mock_self, 'data')
 
         mock_pm.do.assert_called_with(mock_self, 'on', 'data')
-        mock_defer.assert_called_with(
-            mock_reactor, .01, mock_pm.do, mock_self, 'after', 'data'
-        )
-        self.assertTrue(add_err_back.addErrback.called)
-        self.assertTrue(mock_logging.getLogger.called)
-
-        error_callback = add_err_back.addErrback.call_args[0][0]
-        self.assertFalse(logger.error.called)
-        error_callback('test')
-        self.assertTrue(logger.error.called)
+        test_func.assert_called_with(mock_self, 'data')
+        mock_pm.schedule_after.assert_called_with(mock_self, 'data')
 
-    @patch('plugin_manager.reactor')
-    @patch('plugin_manager.deferLater')
-    @patch('plugin_manager.logging')
-    def test_route_response_false(
-        self, mock_logging, mock_defer, mock_reactor
-    ):
+    def test_route_response_false(self):
         test_func = Mock()
         mock_pm = Mock()
         mock_pm.do.return_value = False
@@ -246,7 +319,8 @@ class RouteTestCase(TestCase):
         test_f(mock_self, 'data')
 
         mock_pm.do.assert_called_with(mock_self, 'on', 'data')
-        self.assertFalse(mock_defer.called)
+        self.assertFalse(test_func.called)
+        self.assertFalse(mock_pm.schedule_after.called)
 
     @patch.object(PluginManager, 'deactivate_plugins')
     def test_die(self, mock_deactivate):
@@ -0,0 +1,62 @@
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from plugin_manager import PluginManager
+from plugins.core.player_manager_plugin.plugin import PlayerManagerPlugin
+from server import StarryPyServerProtocol
+
+
+class ConnectionLostTestCase(TestCase):
+    @patch('plugin_manager.sys')
+    @patch('plugin_manager.path')
+    @patch('plugin_manager.ConfigurationManager')
+    def setUp(self, mock_config, mock_path, mock_sys):
+        mock_config.return_value = Mock(inspected_packets=[])
+        self.plugin_manager = PluginManager(Mock())
+
+        self.plugin = PlayerManagerPlugin()
+        self.plugin.player_manager = Mock()
+        self.plugin.logger = Mock()
+        self.plugin_manager.map_plugin_packets(self.plugin)
+
+        # Built by hand, as __init__ needs a running factory.
+        with patch.object(
+                StarryPyServerProtocol, '__init__', lambda self: None
+        ):
+            self.protocol = StarryPyServerProtocol()
+        self.protocol.id = 'protocol'
+        self.protocol.factory = Mock(protocols={'protocol': self.protocol})
+        self.protocol.plugin_manager = self.plugin_manager
+        self.protocol.client_protocol = Mock()
+        self.protocol.idle_timer = Mock()
+        self.protocol.transport = Mock()
+        self.protocol.output = Mock()
+        self.protocol.player = Mock(logged_in=True)
+        # The server module sets its logger up when run as a script.
+        patcher = patch('server.logger', Mock(), create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_lost_connection_ends_session(self):
+        player = self.protocol.player
+        self.protocol.connectionLost()
+
+        self.plugin.player_manager.end_session.assert_called_once_with(player)
+        self.assertFalse(player.admin_logged_in)
+        self.assertEqual(player.party_id, '')
+        self.assertEqual(self.protocol.factory.protocols, {})
+        self.assertTrue(
+            self.protocol.client_protocol.transport.abortConnection.called
+        )
+
+    def test_outputs_are_closed_before_aborting(self):
+        self.protocol.connectionLost()
+
+        client = self.protocol.client_protocol
+        self.assertEqual(
+            [name for name, _, _ in client.method_calls],
+            ['write', 'close_output', 'transport.abortConnection']
+        )
+        self.protocol.output.close.assert_called_once_with()
+        self.assertTrue(self.protocol.transport.abortConnection.called)
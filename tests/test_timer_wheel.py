@@ -0,0 +1,62 @@
+from unittest import TestCase
+
+from timer_wheel import TimerWheel, monotonic
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TimerWheelTestCase(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.wheel = TimerWheel(10, clock=self.clock)
+
+    def test_idle_key_expires(self):
+        self.wheel.add('a')
+        self.clock.now += 9
+        self.assertEqual(self.wheel.advance(), [])
+
+        self.clock.now += 1
+        self.assertEqual(self.wheel.advance(), ['a'])
+        self.assertNotIn('a', self.wheel)
+        self.assertEqual(self.wheel.advance(), [])
+
+    def test_touch_postpones_expiry(self):
+        self.wheel.add('a')
+        self.wheel.add('b')
+        for _ in xrange(25):
+            self.clock.now += 1
+            self.wheel.touch('a')
+            expired = self.wheel.advance()
+            if expired:
+                self.assertEqual(expired, ['b'])
+
+        self.assertIn('a', self.wheel)
+        self.assertNotIn('b', self.wheel)
+
+        self.clock.now += 10
+        self.assertEqual(self.wheel.advance(), ['a'])
+
+    def test_remove(self):
+        self.wheel.add('a')
+        self.wheel.remove('a')
+        self.wheel.touch('a')
+        self.clock.now += 20
+
+        self.assertEqual(self.wheel.advance(), [])
+        self.assertEqual(len(self.wheel), 0)
+
+    def test_long_gap(self):
+        for key in xrange(100):
+            self.wheel.add(key)
+        self.clock.now += 1000
+
+        self.assertEqual(sorted(self.wheel.advance()), range(100))
+
+    def test_monotonic(self):
+        self.assertLessEqual(monotonic(), monotonic())
@@ -0,0 +1,89 @@
+"""
+Hashed timer wheel for idle timeouts.
+"""
+import os
+
+try:
+    from time import monotonic
+except ImportError:
+    def monotonic():
+        """
+        Seconds since an arbitrary point, unaffected by clock changes.
+        """
+        # Elapsed real time, counted by the kernel in clock ticks.
+        return os.times()[4]
+
+
+class TimerWheel(object):
+    """
+    Tracks keys which expire after `timeout` seconds without activity.
+
+    Time is cut into ticks of `tick` seconds, and keys are hashed into one
+    slot per tick by their deadline. `touch` only stores a new deadline and
+    leaves the key where it is; `advance` looks at the slots whose tick has
+    passed, expires the keys whose deadline is up, and re-files the others
+    under their new deadline. Activity is O(1), and each sweep costs the
+    expired keys plus at most one re-filing per live key and timeout.
+    """
+
+    def __init__(self, timeout, tick=1.0, clock=monotonic):
+        self.tick = tick
+        self.clock = clock
+        self.timeout_ticks = max(1, int(-(-timeout // tick)))
+        self.slots = [set() for _ in xrange(self.timeout_ticks + 1)]
+        self.deadlines = {}
+        self.start = clock()
+        self.current = 0
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def __contains__(self, key):
+        return key in self.deadlines
+
+    def add(self, key):
+        """
+        Starts tracking `key`, or restarts its timeout if already tracked.
+        """
+        deadline = self.current + self.timeout_ticks
+        self.deadlines[key] = deadline
+        self.slots[deadline % len(self.slots)].add(key)
+
+    def touch(self, key):
+        """
+        Records activity for `key`. Keys which aren't tracked are ignored.
+        """
+        if key in self.deadlines:
+            self.deadlines[key] = self.current + self.timeout_ticks
+
+    def remove(self, key):
+        """
+        Stops tracking `key`. Its slot entry is dropped on the next sweep.
+        """
+        self.deadlines.pop(key, None)
+
+    def advance(self):
+        """
+        Moves the wheel up to the current time.
+
+        :return: List of keys which expired, no longer tracked.
+        """
+        target = int((self.clock() - self.start) // self.tick)
+        expired = []
+        slots = self.slots
+        deadlines = self.deadlines
+        while self.current < target:
+            self.current += 1
+            index = self.current % len(slots)
+            due = slots[index]
+            slots[index] = set()
+            for key in due:
+                deadline = deadlines.get(key)
+                if deadline is None:
+                    continue
+                if deadline <= self.current:
+                    del deadlines[key]
+                    expired.append(key)
+                else:
+                    slots[deadline % len(slots)].add(key)
+        return expired
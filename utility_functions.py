@@ -3,10 +3,10 @@ import logging
 import os
 import errno
 
-from construct import Container
 from twisted.python.filepath import FilePath
 
 import packets
+from packets.header import write_header
 
 
 path = FilePath(os.path.dirname(os.path.abspath(__file__)))
@@ -49,7 +49,7 @@ def give_item_to_player(player_protocol, item, count=1):
         item_packet = build_packet(
             packets.Packets.GIVE_ITEM, packets.give_item_write(item, x + 1)
         )
-        player_protocol.transport.write(item_packet)
+        player_protocol.write(item_packet)
         item_count -= x
         given += x
     return given
@@ -73,14 +73,7 @@ def build_packet(packet_type, data):
     :return: The build packet.
     :rtype : str
     """
-    length = len(data)
-    return packets.packet().build(
-        Container(
-            id=packet_type,
-            payload_size=length,
-            data=data
-        )
-    )
+    return write_header(packet_type, len(data)) + data
 
 
 class Planet(object):
@@ -114,7 +107,7 @@ def move_ship_to_coords(protocol, x, y, z, planet, satellite):
             satellite=satellite
         )
     )
-    protocol.client_protocol.transport.write(warp_packet)
+    protocol.client_protocol.write(warp_packet)
 
 
 def extract_name(l):